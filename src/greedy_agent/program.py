@@ -2,7 +2,8 @@
 # Project Part B: Game Playing Agent
 
 from referee.game import *
-from utils.board import Board
+from utils.bitboard import BitBoard
+from utils.placements import PLACEMENT_ACTIONS
 from utils.node import Node
 from utils.orderactions import *
 
@@ -18,7 +19,7 @@ class Agent:
         This constructor method runs when the referee instantiates the agent.
         Any setup and/or precomputation should be done here.
         """
-        self.board = Board(initial_player=PlayerColor.RED)
+        self.board = BitBoard(initial_player=PlayerColor.RED)
         self.color = color
         self.ttable = TranspositionTable()
 
@@ -28,9 +29,9 @@ class Agent:
         This method is called by the referee each time it is the agent's turn
         to take an action. It must always return an action object. 
         """
-        actions = self.board.get_legal_actions()
-        best_action = OrderActions.order_actions(self.board, actions, self.ttable, {})[0]
-        return best_action
+        moves = self.board.get_legal_moves()
+        best_move = OrderActions.order_actions(self.board, moves, self.ttable, {})[0]
+        return PLACEMENT_ACTIONS[best_move]
        
 
     def update(self, color: PlayerColor, action: Action, **referee: dict):
@@ -5,6 +5,7 @@ from utils.constants import *
 from utils.table import *
 from utils.node import *
 from utils.iterdeep_agent import *
+from utils.lazysmp import *
 from utils.orderactions import *
 from utils.searchexit import *
 
@@ -18,19 +19,8 @@ class NegamaxAgent(IterativeDeepeningAgent):
         return self.alpha_beta_with_memory(board, alpha, beta, depth, ply, move_values)
 
 
-
-
-
-
-
-
-
-        
-
-
-    
-
-
-
-
-    
+# ______________________________________________________________________________
+class LazySMPNegamaxAgent(LazySMP, NegamaxAgent):
+    """
+    NegamaxAgent searching with Lazy SMP helper processes.
+    """
@@ -2,7 +2,8 @@
 # Project Part B: Game Playing Agent
 
 from referee.game import PlayerColor, Action, PlaceAction, Coord
-from utils.board import Board
+from utils.bitboard import BitBoard
+from utils.placements import PLACEMENT_ACTIONS
 from utils.constants import *
 from habp_agent.habp_agent import *
 from utils.node import *
@@ -18,8 +19,8 @@ class Agent:
         This constructor method runs when the referee instantiates the agent.
         Any setup and/or precomputation should be done here.
         """
-        self.board = Board(initial_player=PlayerColor.RED)
-        self.agent = NegamaxAgent(color)
+        self.board = BitBoard(initial_player=PlayerColor.RED)
+        self.agent = LazySMPNegamaxAgent(color)
 
 
     def action(self, **referee: dict) -> Action:
@@ -30,10 +31,10 @@ class Agent:
         print("@ starting time:", referee["time_remaining"])
         print("@ starting space:", referee["space_remaining"])
         print("turn count:", self.board.turn_count)
-        best_action = self.agent.best_action(self.board, referee["time_remaining"])
+        best_move = self.agent.best_action(self.board, referee["time_remaining"])
         print("@ ending time:", referee["time_remaining"])
         print("@ ending space:", referee["space_remaining"])
-        return best_action
+        return PLACEMENT_ACTIONS[best_move]
        
 
     def update(self, color: PlayerColor, action: Action, **referee: dict):
@@ -42,3 +43,11 @@ class Agent:
         turn. You should use it to update the agent's internal game state. 
         """
         self.board.apply_action(action)
+
+    def close(self):
+        """
+        This method is called when the agent is no longer needed, e.g. before
+        a new game in a reused agent process. It stops the search's helper
+        processes.
+        """
+        self.agent.close()
@@ -1,165 +1,312 @@
 import numpy as np
+import random
+import time
+
+from referee.game import PlayerColor
+from utils.bitboard import BitBoard
+from utils.constants import *
+from mcts_agent.rollout import rollout
+
+# reward of a playout for the player who made a move, by result
+_REWARDS = {WIN: 1.0, DRAW: 0.5, LOSS: 0.0}
+
+class MCTS:
+    """
+    Monte Carlo tree search over a `BitBoard`. Nodes store only the move that
+    leads to them, and the tree is searched by applying moves to a single
+    board from the root position and undoing them after each simulation.
+
+    Node i is described by entry i of a set of flat arrays: its parent, its
+    move (placement index), its visit count and its total reward for the
+    player who made the move. Children and untried moves are python lists,
+    and the children of fully expanded nodes are frozen into numpy arrays for
+    vectorised selection.
+
+    Playouts can also be run in batches by worker processes (leaf
+    parallelism), in which case each selected path gets `virtual_loss` extra
+    visits, counted as losses, until its result is backpropagated.
+
+    The tree is kept across turns by re-rooting it on the moves played
+    (`advance`), and holds at most `max_nodes` nodes, set from the memory left
+    by `set_space_remaining`. When it is full, the least visited subtrees are
+    pruned (`prune`). Both compact the remaining nodes to the front of the
+    arrays, so that freed nodes are reused straight away.
+    """
+    def __init__(self, board: BitBoard, capacity: int = 1024, virtual_loss: float = VIRTUAL_LOSS):
+        self.board = board
+        self.virtual_loss = virtual_loss
+        self.max_nodes = MCTS_MAX_NODES
+        self.parents = np.full(capacity, -1, dtype=np.int32)
+        self.moves = np.full(capacity, -1, dtype=np.int32)
+        self.visits = np.zeros(capacity, dtype=np.float64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.children: list[list[int] | np.ndarray] = []
+        self.untried: list[list[int] | None] = []
+        self.num_nodes = 0
+        self.root = self._new_node(-1, -1)
+
+    def _new_node(self, parent: int, move: int) -> int:
+        """
+        Add a node to the tree and return its index.
+        """
+        node = self.num_nodes
+        if node == len(self.parents):
+            self._grow()
+        self.parents[node] = parent
+        self.moves[node] = move
+        self.visits[node] = 0
+        self.rewards[node] = 0
+        self.children.append([])
+        self.untried.append(None)
+        self.num_nodes += 1
+        if parent >= 0:
+            self.children[parent].append(node)
+        return node
+
+    def _grow(self):
+        """
+        Double the capacity of the node arrays.
+        """
+        capacity = len(self.parents)
+        self.parents = np.concatenate([self.parents, np.full(capacity, -1, dtype=np.int32)])
+        self.moves = np.concatenate([self.moves, np.full(capacity, -1, dtype=np.int32)])
+        self.visits = np.concatenate([self.visits, np.zeros(capacity)])
+        self.rewards = np.concatenate([self.rewards, np.zeros(capacity)])
+
+    @property
+    def full(self) -> bool:
+        return self.num_nodes >= self.max_nodes
+
+    def set_space_remaining(self, space_remaining: float | None):
+        """
+        Set the maximum number of nodes from the memory (in MB) the referee
+        has left for the agent, which already includes the current nodes.
+        """
+        if space_remaining is None:
+            self.max_nodes = MCTS_MAX_NODES
+            return
+        free_nodes = int(space_remaining * 2**20 * MCTS_SPACE_FRACTION / MCTS_NODE_BYTES)
+        self.max_nodes = min(MCTS_MAX_NODES, self.num_nodes + max(free_nodes, 0))
+
+    def best_move(self, expire_time) -> int:
+        """
+        Run simulations until the time limit expires, and return the move of
+        the most visited child of the root.
+        """
+        while time.time() < expire_time:
+            if self.full:
+                self.prune()
+            self.simulate()
+        children = self.children[self.root]
+        if len(children) == 0:
+            return random.choice(self.board.get_legal_moves())
+        children = np.asarray(children)
+        return int(self.moves[children[np.argmax(self.visits[children])]])
+
+    def simulate(self):
+        """
+        Run one simulation: select a leaf, expand it, play out the rest of the
+        game and backpropagate the result.
+        """
+        mutations = []
+        path = self._select(mutations)
+        winner = self.playout()
+        self.backpropagate(path, winner)
+        for mutation in reversed(mutations):
+            self.board.undo_action(mutation)
+
+    def select_batch(self, batch_size: int) -> list[tuple]:
+        """
+        Select and expand up to `batch_size` leaves, adding virtual loss to
+        their paths. Return a (path, leaf color, leaf encoding, winner) tuple
+        per leaf, where the encoding is None and the winner known if the leaf
+        is terminal.
+        """
+        board = self.board
+        leaves = []
+        for _ in range(batch_size):
+            mutations = []
+            path = self._select(mutations)
+            self.visits[path] += self.virtual_loss
+            if board.game_over:
+                leaves.append((path, board.turn_color, None, board.winner_color))
+            else:
+                leaves.append((path, board.turn_color, board.encode(), None))
+            for mutation in reversed(mutations):
+                board.undo_action(mutation)
+        return leaves
+
+    def backpropagate_batch(self, leaves: list[tuple], winners: list[PlayerColor | None]):
+        """
+        Remove the virtual loss of a batch of leaves returned by
+        `select_batch` and backpropagate the results of their playouts, given
+        in the same order (the results of terminal leaves are ignored).
+        """
+        for (path, color, encoding, winner), result in zip(leaves, winners):
+            self.visits[path] -= self.virtual_loss
+            self.backpropagate(path, winner if encoding is None else result, color)
+
+    def root_visits(self) -> dict[int, float]:
+        """
+        Return the visit count of each move tried at the root.
+        """
+        children = self.children[self.root]
+        return {
+            int(self.moves[child]): float(self.visits[child]) for child in children
+        }
 
-from utils.board import Board
-import copy
-from utils.constants import WIN, LOSS, DRAW
-# CODE IS BROKEN
-
-class MCTSNode:
-    def __init__(self, board: Board, color, parent=None, parent_action=None):
-        self.state = board
-        self.color = color
-        self.parent = parent
-        self.parent_action = parent_action
-        self.children = dict()
-        self._number_of_visits = 0
-        self._results = {WIN: 0, LOSS: 0, DRAW: 0}
-        self._untried_actions = self.state.get_legal_actions()
-        self._legal_actions = self._untried_actions
-        return
-    
-    def q(self):
-        """
-        Return the total utility of the current node, which is #wins
-        """
-        wins = self._results[WIN]
-        return wins
-    
-    def n(self):
-        """
-        Return the total number of playouts through the current node
-        """
-        return self._number_of_visits
-    
-    def expand(self):
-        """
-        Expand the current node by adding to the tree a single new child of the
-        current node
-        """
-        action = self._untried_actions.pop()
-        next_board = copy.deepcopy(self.state)
-        next_board.apply_action(action)
-        child_node = MCTSNode(
-            next_board, self.color, parent=self, parent_action=action)
-        self.children[action] = child_node
-        return child_node 
-    
-    def is_terminal_node(self):
-        """
-        Returns true if current board represented by the current node fulfils a
-        winning condition.
-        """
-        return self.state.game_over
-    
-    def playout(self):
-        current_playout_state = copy.deepcopy(self.state)
-        player_possible_moves = self._legal_actions
-        while not current_playout_state.game_over:
-            action_info = self.playout_policy(current_playout_state, player_possible_moves)
-            current_playout_state = action_info[1]
-            player_possible_moves = action_info[2]
-            # print("possible_moves", possible_moves)
-            # print("action:", action)               
-            # print("player:", current_playout_state._turn_color)
-            # print("turn_count:", current_playout_state.turn_count)
-            # print(current_playout_state.render(use_color=True))
-        return current_playout_state.game_result(self.color)
-
-    def backpropagate(self, result):
-        self._number_of_visits += 1.
-        self._results[result] += 1.
-        if self.parent:
-            self.parent.backpropagate(result)
-    
-    def is_fully_expanded(self):
-        return len(self._untried_actions) == 0
-    
-    def choice_weight(self, c, c_param=1.414):
-        return (c.q() / c.n()) + c_param * np.sqrt((2 * np.log(self.n()) / c.n()))
-    
-    def best_child(self, c_param=1.414):
-        choice_weights = []
-        children = []
-        for c in self.children.values():
-            choice_weights.append(self.choice_weight(c, c_param))
-            children.append(c)
-        return children[np.argmax(choice_weights)]
-    
-    # ==========================================================================
-    # Simulation Phase
-
-    def playout_policy(self, state, possible_moves):
-        return self.random_playout(state, possible_moves)
-        # return self.heuristic_playout(state, possible_moves)
-    
-    def random_playout(self, state: Board, possible_moves):
-        best_move = possible_moves[np.random.randint(len(possible_moves))]
-        state.apply_action(best_move)
-        return best_move, state, state.get_legal_actions()
-    
-    def heuristic_playout(self, state, possible_moves):
-        utilities = []
-        action_infos = []
-        for move in possible_moves:
-            action_info = self.eval_fn(state, move)
-            utilities.append(action_info[0])
-            action_infos.append(action_info)
-        index = np.argmax(utilities)
-        return action_infos[index]
-    
-    def eval_fn(self, state: Board, action):
-        """
-        Return the utility, board state and legal actions of the opponent for
-        a given action
-        """
-        # board after applying the input action
-        board = copy.deepcopy(state)
-        board.apply_action(action)
-
-        # calculate how many more legal actions can the player take compared
-        # to the opponent
-        opponent_actions = board.get_legal_actions()
-        board.modify_turn_color()
-        player_actions = board.get_legal_actions()
-        board.modify_turn_color()
-        num_opponent_actions = len(opponent_actions)
-        num_player_actions = len(player_actions)
-        num_extra_actions = num_player_actions - num_opponent_actions
-
-        # calculate how many more tokens the player has compared to the opponent
-        player_color = state._turn_color
-        opponent_color = player_color.opponent
-        num_player_tokens = board._player_token_count(player_color)
-        num_opponent_tokens = board._player_token_count(opponent_color)
-        num_extra_tokens = num_player_tokens - num_opponent_tokens
-
-        utility = 0.5*num_extra_tokens + 0.5*num_extra_actions
-        # print("num_extra_actions:", num_extra_actions, "num_extra_tokens:", num_extra_actions, "utility:", utility)
-        return utility, board, opponent_actions
     # ==========================================================================
-    def _tree_policy(self):
-        current_node = self
-        while not current_node.is_terminal_node():
-            
-            if not current_node.is_fully_expanded():
-                return current_node.expand()
+    # Tree reuse and pruning
+
+    def advance(self, move: int):
+        """
+        Re-root the tree on the child reached by a move that has just been
+        played on the board, freeing the rest of the tree. If the move was
+        never tried, start a new tree.
+        """
+        for child in self.children[self.root]:
+            if self.moves[child] == move:
+                self._compact(self._subtree(child))
+                return
+        self.num_nodes = 0
+        self.children = []
+        self.untried = []
+        self.root = self._new_node(-1, -1)
+
+    def prune(self, keep_fraction: float = MCTS_PRUNE_KEEP):
+        """
+        Free the least visited subtrees, keeping at most `keep_fraction` of
+        `max_nodes` nodes. The moves of the freed children are tried again.
+        """
+        # a child never has more visits than its parent, so the nodes with
+        # enough visits are the top of the tree
+        visits = self.visits[:self.num_nodes]
+        target = max(1, int(self.max_nodes * keep_fraction))
+        if self.num_nodes <= target:
+            return
+        threshold = np.sort(visits)[::-1][target] + 1
+        keep = visits >= threshold
+        # the root may tie with the nodes cut off, but is always kept
+        keep[self.root] = True
+        self._compact(np.flatnonzero(keep))
+
+    def _subtree(self, node: int) -> np.ndarray:
+        """
+        Return the nodes of the subtree of a node, starting with the node.
+        """
+        nodes = [node]
+        for node in nodes:
+            nodes.extend(self.children[node])
+        return np.array(nodes, dtype=np.int32)
+
+    def _compact(self, keep: np.ndarray):
+        """
+        Keep only the given nodes, which must include the parent of each node
+        but the first, and move them to the front of the arrays in the given
+        order. The first node becomes the root (so the root is always node 0),
+        and the moves of removed children are returned to the untried moves of
+        their parents.
+        """
+        remap = np.full(self.num_nodes, -1, dtype=np.int32)
+        remap[keep] = np.arange(len(keep), dtype=np.int32)
+        num_nodes = len(keep)
+        moves = self.moves[:self.num_nodes].copy()
+        parents = self.parents[keep]
+        self.parents[:num_nodes] = np.where(parents >= 0, remap[parents], -1)
+        self.moves[:num_nodes] = moves[keep]
+        self.visits[:num_nodes] = self.visits[keep]
+        self.rewards[:num_nodes] = self.rewards[keep]
+
+        children, untried = [], []
+        for node in keep.tolist():
+            node_children = np.asarray(self.children[node], dtype=np.int32)
+            node_untried = self.untried[node]
+            kept = remap[node_children]
+            if len(node_children) == 0:
+                children.append([])
+            elif (kept >= 0).all():
+                children.append(kept if isinstance(self.children[node], np.ndarray) else kept.tolist())
             else:
-                current_node = current_node.best_child()
-        return current_node
-    
-    def best_action(self):
-        simulation_no = 20
-        simulation_no += self.state.turn_count*2
-        
-        for i in range(simulation_no):
-            v = self._tree_policy()
-            reward = v.playout()
-            v.backpropagate(reward)
-
-            print("simulation no:", i, "game result:", reward)
-        
-        # sqrt(2)=1.414, this is the theoretical value of C
-        return self.best_child(c_param=1.414)
-    
-    
+                children.append(kept[kept >= 0].tolist())
+                node_untried.extend(moves[node_children[kept < 0]].tolist())
+            untried.append(node_untried)
+        self.children = children
+        self.untried = untried
+        self.root = 0
+        self.num_nodes = num_nodes
+
+    # ==========================================================================
+    # Selection and expansion
 
+    def _select(self, mutations: list) -> list[int]:
+        """
+        Descend from the root by UCB1 and expand a single new child, applying
+        the moves to the board. Return the path of nodes from the root.
+        """
+        board = self.board
+        node = self.root
+        path = [node]
+        while not board.game_over:
+            untried = self.untried[node]
+            if untried is None:
+                untried = board.get_legal_moves()
+                random.shuffle(untried)
+                self.untried[node] = untried
+            if untried:
+                move = untried.pop()
+                mutations.append(board.apply_move(move))
+                child = self._new_node(node, move)
+                if not untried:
+                    self.children[node] = np.array(self.children[node], dtype=np.int32)
+                path.append(child)
+                return path
+            node = self._best_child(node)
+            mutations.append(board.apply_move(int(self.moves[node])))
+            path.append(node)
+        return path
+
+    def _best_child(self, node: int, c_param=1.414) -> int:
+        """
+        Return the child of a fully expanded node maximising UCB1.
+        """
+        children = self.children[node]
+        visits = self.visits[children]
+        weights = self.rewards[children] / visits \
+            + c_param * np.sqrt(np.log(self.visits[node]) / visits)
+        return int(children[np.argmax(weights)])
+
+    # ==========================================================================
+    # Simulation
+
+    def playout(self) -> PlayerColor | None:
+        """
+        Play out the game from the current position with the rollout policy
+        and return the winner (None for a draw).
+        """
+        board = self.board
+        if board.game_over:
+            return board.winner_color
+        return rollout(board.encode())
+
+    # ==========================================================================
+    # Backpropagation
+
+    def backpropagate(self, path: list[int], winner: PlayerColor | None, color: PlayerColor = None):
+        """
+        Add the result of a playout to the nodes of a path, each rewarded from
+        the perspective of the player who made its move. `color` is the player
+        to move at the leaf, by default the player to move on the board.
+        """
+        # the player to move at the leaf made the move of every second node
+        # counting back from the leaf's parent
+        if color is None:
+            color = self.board.turn_color
+        for node in reversed(path):
+            mover = color.opponent
+            if winner is None:
+                reward = _REWARDS[DRAW]
+            else:
+                reward = _REWARDS[WIN if winner == mover else LOSS]
+            self.visits[node] += 1
+            self.rewards[node] += reward
+            color = mover
@@ -0,0 +1,180 @@
+import multiprocessing
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from referee.game import PlayerColor
+from utils.bitboard import BitBoard
+from utils.constants import *
+from mcts_agent.mcts import MCTS
+from mcts_agent.rollout import rollout
+
+# ______________________________________________________________________________
+def _search_tree(encoding: tuple[int, int, int, int], expire_time: float):
+    """
+    Task of root parallelism: grow an independent tree from the encoded
+    position until the time limit expires, and return the visit counts of the
+    root moves and the CPU time spent.
+    """
+    start = time.process_time()
+    tree = MCTS(BitBoard.decode(encoding))
+    while time.time() < expire_time:
+        tree.simulate()
+    return tree.root_visits(), time.process_time() - start
+
+
+def _play_out(encodings: list[tuple[int, int, int, int]]):
+    """
+    Task of leaf parallelism: play out each of the encoded positions, and
+    return the winners and the CPU time spent.
+    """
+    start = time.process_time()
+    winners = [rollout(encoding) for encoding in encodings]
+    return winners, time.process_time() - start
+
+
+def _ready():
+    """
+    Empty task run once by each worker to start the pool.
+    """
+    return None
+
+
+class ParallelMCTS:
+    """
+    Monte Carlo tree search over a pool of worker processes, in one of two
+    modes:
+    - "root": each worker grows its own tree from the root, while the agent
+      process grows the kept tree, and the root moves' visit counts are
+      summed over the trees.
+    - "leaf": the agent process grows a single tree, selecting leaves in
+      batches with virtual loss, and the workers play out the leaves.
+    As with `ParallelPVSAgent`, the workers' CPU time is charged against a
+    separate budget, and without workers (or once it runs out) the search runs
+    in-process. All the searches grow the same tree in the agent process,
+    kept across turns.
+    """
+    def __init__(self, num_workers=SEARCH_WORKERS, mode=MCTS_PARALLEL_MODE,
+                 batch_size=MCTS_BATCH_SIZE, virtual_loss=VIRTUAL_LOSS,
+                 worker_time_budget=WORKER_TIME_BUDGET):
+        assert mode in ("root", "leaf")
+        self.num_workers = num_workers
+        self.mode = mode
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
+        self.worker_time_left = worker_time_budget
+        self.tree = None
+        self.executor = None
+        if num_workers == 0:
+            return
+
+        # reseed each worker, as forked workers would all share the agent's
+        # random state
+        self.executor = ProcessPoolExecutor(
+            num_workers, mp_context=multiprocessing.get_context("fork"),
+            initializer=random.seed)
+        # the referee replaces stdin by an object that multiprocessing cannot
+        # close in the child, so start the workers (all forked on the first
+        # submission) without it
+        stdin, sys.stdin = sys.stdin, None
+        try:
+            self.executor.submit(_ready).result()
+        finally:
+            sys.stdin = stdin
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def advance(self, move: int):
+        """
+        Re-root the kept tree on a move that has just been played.
+        """
+        if self.tree is not None:
+            self.tree.advance(move)
+
+    def best_move(self, board: BitBoard, expire_time: float, space_remaining: float = None) -> int:
+        """
+        Return the most visited root move of the search until the time limit
+        expires. The kept tree is sized from `space_remaining`, the memory (in
+        MB) the referee has left for the agent.
+        """
+        if self.tree is None:
+            self.tree = MCTS(board, virtual_loss=self.virtual_loss)
+        self.tree.set_space_remaining(space_remaining)
+        if self.executor is None or self.worker_time_left <= 0:
+            return self.tree.best_move(expire_time)
+        if self.mode == "root":
+            return self.root_parallel_search(board, expire_time)
+        return self.leaf_parallel_search(board, expire_time)
+
+    def root_parallel_search(self, board: BitBoard, expire_time: float) -> int:
+        """
+        Grow an independent tree per worker, and the kept tree in the agent
+        process meanwhile, and return the root move with the most visits over
+        all the trees.
+        """
+        worker_expire_time = min(
+            expire_time, time.time() + self.worker_time_left/self.num_workers)
+        encoding = board.encode()
+        futures = [
+            self.executor.submit(_search_tree, encoding, worker_expire_time)
+            for _ in range(self.num_workers)
+        ]
+
+        # the workers' trees are thrown away, but the kept tree carries its
+        # visits over to the next turn
+        self.tree.best_move(expire_time)
+        visits = self.tree.root_visits()
+        for future in futures:
+            root_visits, time_used = future.result()
+            self.worker_time_left -= time_used
+            for move, count in root_visits.items():
+                visits[move] = visits.get(move, 0) + count
+        if not visits:
+            return random.choice(board.get_legal_moves())
+        return max(visits, key=visits.get)
+
+    def leaf_parallel_search(self, board: BitBoard, expire_time: float) -> int:
+        """
+        Grow a single tree, playing out batches of leaves in the workers. The
+        next batch is selected while the previous one is being played out.
+        """
+        tree = self.tree
+        # split each batch into one task per worker
+        chunk_size = -(-self.batch_size // self.num_workers)
+        pending = deque()
+        while True:
+            searching = time.time() < expire_time and self.worker_time_left > 0
+            if not searching and not pending:
+                break
+            if searching and tree.full and not pending:
+                tree.prune()
+            if searching and len(pending) < 2 and not tree.full:
+                leaves = tree.select_batch(self.batch_size)
+                encodings = [leaf[2] for leaf in leaves if leaf[2] is not None]
+                futures = [
+                    self.executor.submit(_play_out, encodings[i:i + chunk_size])
+                    for i in range(0, len(encodings), chunk_size)
+                ]
+                pending.append((leaves, futures))
+                continue
+
+            leaves, futures = pending.popleft()
+            results = []
+            for future in futures:
+                winners, time_used = future.result()
+                self.worker_time_left -= time_used
+                results.extend(winners)
+            # line the results up with the leaves, terminal leaves included
+            results = iter(results)
+            tree.backpropagate_batch(
+                leaves, [None if leaf[2] is None else next(results) for leaf in leaves])
+        # if the workers' budget ran out, carry on in-process
+        return tree.best_move(expire_time)
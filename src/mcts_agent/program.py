@@ -1,15 +1,14 @@
 # COMP30024 Artificial Intelligence, Semester 1 2024
 # Project Part B: Game Playing Agent
 
-# =============================================================================
-# BROKEN DO NOT USE!
-# =============================================================================
-
 from referee.game import PlayerColor, Action, PlaceAction, Coord
-from mcts_agent.mcts import MCTSNode
-from utils.board import Board
+from mcts_agent.parallel_mcts import ParallelMCTS
+from utils.bitboard import BitBoard
+from utils.openingbook import OpeningBook
+from utils.placements import PLACEMENT_ACTIONS
 from utils.constants import *
 import random
+import time
 
 
 class Agent:
@@ -23,46 +22,45 @@ class Agent:
         This constructor method runs when the referee instantiates the agent.
         Any setup and/or precomputation should be done here.
         """
-        initial_board = Board(initial_player=PlayerColor.RED)
-        self.root = MCTSNode(initial_board, color)
-        self.next = None
+        self.board = BitBoard(initial_player=PlayerColor.RED)
+        self.color = color
+        self.search = ParallelMCTS()
+        self.opening_book = OpeningBook()
 
     def action(self, **referee: dict) -> Action:
         """
         This method is called by the referee each time it is the agent's turn
         to take an action. It must always return an action object. 
         """
-        num_empty_cells = len(self.root.state._empty_coords())
-        if num_empty_cells > OPENING_STAGE:
-            legal_actions = self.root.state.get_legal_actions()
-            best_action = random.choice(legal_actions)
+        num_empty_cells = self.board._empty_mask().bit_count()
+        book_move = self.opening_book.lookup(self.board)
+        if book_move is not None:
+            best_move = book_move
+        elif self.board.turn_count == 0 or num_empty_cells > EMPTY_THRESHOLD:
+            # play a random move in the opening
+            best_move = random.choice(self.board.get_legal_moves())
         else:
-            best_child = self.root.best_action()
-            self.next = best_child
-            best_action = best_child.parent_action
-        return best_action
-       
+            time_remaining = referee["time_remaining"]
+            expire_time = time.time() \
+                + time_remaining/(MAX_TURNS - self.board.turn_count) \
+                + self.board.turn_count/TIME_OUT_FACTOR
+            best_move = self.search.best_move(
+                self.board, expire_time, referee["space_remaining"])
+        return PLACEMENT_ACTIONS[best_move]
 
     def update(self, color: PlayerColor, action: Action, **referee: dict):
         """
         This method is called by the referee after an agent has taken their
         turn. You should use it to update the agent's internal game state. 
         """
-        num_empty_cells = len(self.root.state._empty_coords())
-        if num_empty_cells > OPENING_STAGE:
-            self.root.state.apply_action(action)
-        else:
-            if color == self.root.color:
-                self.root = self.next
-            else:
-                child_node = self.root.children.get(action)
-                if child_node is None:
-                    self.root.state.apply_action(action)
-                    self.root = MCTSNode(self.root.state, self.root.color)
-                else:
-                    self.root = child_node
+        mutation = self.board.apply_action(action)
+        # keep the search tree below the move played, by either player
+        self.search.advance(mutation.move)
 
-        # print("initial color:", initial_color, "| initial turn_count:", initial_turn_count)
-        # print("input color:", color, "| input action:", action)
-        # print("current color:", self.root.state.turn_color, "| turn_count:", self.root.state.turn_count)
-        # print(self.root.state.render(use_color=True))
\ No newline at end of file
+    def close(self):
+        """
+        This method is called when the agent is no longer needed, e.g. before
+        a new game in a reused agent process. It stops the search's worker
+        processes.
+        """
+        self.search.close()
@@ -0,0 +1,116 @@
+import random
+
+from referee.game import PlayerColor
+from utils.bitboard import *
+from utils.constants import *
+
+# ______________________________________________________________________________
+def rollout(encoding: tuple[int, int, int, int], candidates: int = ROLLOUT_CANDIDATES) -> PlayerColor | None:
+    """
+    Play out the game from a position encoded by `BitBoard.encode` and return
+    the winner (None for a draw). The position is kept as plain token masks
+    and moves are sampled directly instead of enumerating the legal moves. If
+    `candidates` is more than 1, that many moves are sampled each turn and
+    the one clearing the most opponent tokens is played.
+    """
+    red, blue, color, turn_count = encoding
+    tokens = [red, blue]
+    while turn_count < MAX_TURNS:
+        player, opponent = tokens[color], tokens[1 - color]
+        occupied = player | opponent
+        move = _sample_move(player, occupied)
+        if move is None:
+            # the player to move cannot place a piece, so the opponent wins
+            return PlayerColor(1 - color)
+        remove = _cleared_lines(move, occupied)
+        if candidates > 1:
+            for _ in range(candidates - 1):
+                other = _sample_move(player, occupied)
+                other_remove = _cleared_lines(other, occupied)
+                if (other_remove & opponent).bit_count() > (remove & opponent).bit_count():
+                    move, remove = other, other_remove
+
+        tokens[color] |= PLACEMENT_MASKS[move]
+        if remove:
+            tokens[0] &= ~remove
+            tokens[1] &= ~remove
+        color = 1 - color
+        turn_count += 1
+
+    # the player with the most tokens wins, or if equal, the game is a draw
+    balance = tokens[0].bit_count() - tokens[1].bit_count()
+    if balance == 0:
+        return None
+    return PlayerColor.RED if balance > 0 else PlayerColor.BLUE
+
+
+def _cleared_lines(move: int, occupied: int) -> int:
+    """
+    Return the cells of the lines completed by placing a move.
+    """
+    occupied |= PLACEMENT_MASKS[move]
+    remove = 0
+    for line in PLACEMENT_LINE_MASKS[move]:
+        if occupied & line == line:
+            remove |= line
+    return remove
+
+
+def _random_cell(mask: int, rand) -> int:
+    """
+    Return a cell of a non-empty mask: the first one from a random cell
+    onwards, wrapping around.
+    """
+    start = int(rand() * NUM_CELLS)
+    above = mask >> start << start or mask
+    return (above & -above).bit_length() - 1
+
+
+def _sample_move(player: int, occupied: int) -> int | None:
+    """
+    Return a random legal move of a player with the `player` tokens, or None
+    if there is none. A frontier cell and a placement covering it are drawn
+    at random and rejected if blocked. After ROLLOUT_TRIES rejections a piece
+    is grown instead from a random frontier cell through random empty
+    neighbours, and only if that gets stuck are the legal moves enumerated.
+    """
+    # random.random() indexing is much cheaper than random.choice here
+    rand = random.random
+    if not player:
+        # first move of the player, which may go anywhere
+        while True:
+            move = int(rand() * NUM_PLACEMENTS)
+            if not PLACEMENT_MASKS[move] & occupied:
+                return move
+
+    empty = FULL_MASK & ~occupied
+    frontier = adjacent(player) & empty
+    if not frontier:
+        return None
+    for _ in range(ROLLOUT_TRIES):
+        placements = CELL_PLACEMENTS[_random_cell(frontier, rand)]
+        move = placements[int(rand() * len(placements))]
+        if not PLACEMENT_MASKS[move] & occupied:
+            return move
+
+    piece = 1 << _random_cell(frontier, rand)
+    for _ in range(3):
+        neighbours = adjacent(piece) & empty
+        if not neighbours:
+            break
+        piece |= 1 << _random_cell(neighbours, rand)
+    else:
+        return PLACEMENT_INDEX[piece]
+
+    # go through the frontier cells from a random one, enumerating the moves
+    # covering each
+    cells = mask_indices(frontier)
+    start = int(rand() * len(cells))
+    for i in cells[start:] + cells[:start]:
+        moves = [
+            move for move in CELL_PLACEMENTS[i]
+            if not PLACEMENT_MASKS[move] & occupied
+        ]
+        if moves:
+            return moves[int(rand() * len(moves))]
+    return None
@@ -0,0 +1,139 @@
+import multiprocessing
+import sys
+import time
+import weakref
+
+from utils.bitboard import BitBoard
+from pvs_agent.pvs_agent import *
+
+# ______________________________________________________________________________
+def _search_worker(color: PlayerColor, conn, agent_conns):
+    """
+    Entry point of a search worker process. The worker keeps its own agent
+    (and transposition table) across moves, and answers each task sent over
+    `conn` with the results of `root_split_search`, the CPU time spent and
+    the search statistics, if they are collected.
+    """
+    # close the agent's ends of the pipes, inherited on fork, so that the
+    # worker sees EOF once the agent process has gone
+    for agent_conn in agent_conns:
+        agent_conn.close()
+    agent = PVSAgent(color)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            # the agent process has exited
+            return
+        if task is None:
+            return
+        encoding, root_moves, expire_time = task
+        start = time.process_time()
+        results = agent.root_split_search(BitBoard.decode(encoding), root_moves, expire_time)
+        conn.send((results, time.process_time() - start, agent.stats))
+
+
+def _stop_workers(workers: list):
+    """
+    Stop worker processes, given as (process, connection) pairs.
+    """
+    for process, conn in workers:
+        try:
+            conn.send(None)
+        except OSError:
+            # the worker has already exited
+            pass
+        conn.close()
+        process.join()
+    workers.clear()
+
+
+class ParallelPVSAgent(PVSAgent):
+    """
+    A root-parallel principal variation search. The best root moves are
+    partitioned among worker processes, each of which runs its own iterative
+    deepening search over its share; the agent process only waits for and
+    merges the results, so its own (referee-charged) CPU time stays small.
+    The workers' CPU time is charged against a separate budget, and once it
+    runs out the agent searches in-process. The workers are stopped by
+    `close`, or else when the agent is collected or its process exits.
+    """
+    def __init__(self, color: PlayerColor, num_workers=SEARCH_WORKERS, worker_time_budget=WORKER_TIME_BUDGET):
+        super().__init__(color)
+        self.worker_time_left = worker_time_budget
+        self.workers = []
+        # the referee replaces stdin by an object that multiprocessing cannot
+        # close in the child, and the workers never read it anyway
+        stdin, sys.stdin = sys.stdin, None
+        try:
+            for _ in range(num_workers):
+                conn, worker_conn = multiprocessing.Pipe()
+                agent_conns = [c for _, c in self.workers] + [conn]
+                process = multiprocessing.Process(
+                    target=_search_worker, args=(color, worker_conn, agent_conns),
+                    daemon=True)
+                process.start()
+                worker_conn.close()
+                self.workers.append((process, conn))
+        finally:
+            sys.stdin = stdin
+        self._finalizer = weakref.finalize(self, _stop_workers, self.workers)
+
+    def close(self):
+        """
+        Stop the worker processes. The agent then searches in-process.
+        """
+        self._finalizer()
+
+    def iterative_deepening_search(self, board: BitBoard, max_depth=MAX_SEARCH_DEPTH, expire_time=None):
+        """
+        Return the best move, searching the best root moves in parallel until
+        the time limit expires.
+        """
+        if not self.workers or self.worker_time_left <= 0:
+            return super().iterative_deepening_search(board, max_depth, expire_time)
+
+        if self.stats is not None:
+            self.stats.reset()
+        moves = board.get_legal_moves()
+        moves = OrderActions.order_actions(board, moves, self.transposition_table, {})
+        moves = OrderActions.topk_actions(moves)
+        if len(moves) == 1:
+            self.dump_stats(board)
+            return moves[0]
+
+        # partition the moves so that each worker gets some of the best ones
+        num_tasks = min(len(self.workers), len(moves))
+        expire_time = min(expire_time, time.time() + self.worker_time_left/num_tasks)
+        encoding = board.encode()
+        for i, (_, conn) in enumerate(self.workers[:num_tasks]):
+            conn.send((encoding, moves[i::num_tasks], expire_time))
+
+        # the statistics of the move are those of all the workers' searches
+        worker_results = []
+        for _, conn in self.workers[:num_tasks]:
+            results, time_used, stats = conn.recv()
+            self.worker_time_left -= time_used
+            worker_results.append(results)
+            if self.stats is not None and stats is not None:
+                self.stats.merge(stats)
+        self.dump_stats(board)
+        return self.merge_results(worker_results)
+
+    @staticmethod
+    def merge_results(worker_results):
+        """
+        Return the best move over the workers' results, comparing the values
+        of the deepest depth that every worker completed. A worker that
+        searched the game tree to the end has exact values at every depth.
+        """
+        def completed_depth(results, full_depth):
+            return np.inf if full_depth else max(results)
+        depth = min(completed_depth(*r) for r in worker_results)
+
+        best_value, best_move = -np.inf, None
+        for results, _ in worker_results:
+            value, move = results[min(depth, max(results))]
+            if move is not None and (best_move is None or value > best_value):
+                best_value, best_move = value, move
+        return best_move
@@ -5,6 +5,7 @@ from utils.constants import *
 from utils.table import *
 from utils.node import *
 from utils.iterdeep_agent import *
+from utils.lazysmp import *
 from utils.orderactions import *
 from utils.searchexit import *
 
@@ -12,29 +13,71 @@ from utils.searchexit import *
 class PVSAgent(IterativeDeepeningAgent):
     def __init__(self, color: PlayerColor):
         super().__init__(color)
+        # if set, the moves searched at the root instead of all legal moves
+        self.root_moves = None
         return
 
+    def root_split_search(self, board: Board, root_moves: list[int], expire_time):
+        """
+        Search only the given root moves with iterative deepening until the
+        time limit expires. Return the best value and move of each completed
+        depth, and whether the game tree was searched to the end.
+        """
+        self.root_moves = root_moves
+        self.expire_time = expire_time
+        self.transposition_table.new_search()
+        if self.stats is not None:
+            self.stats.reset()
+        move_values = {}
+        results = {}
+        full_depth = False
+        depth = 1
+        while depth < MAX_SEARCH_DEPTH:
+            value, best_move, exit_type = self.search(board, -np.inf, np.inf, depth, 0, move_values)
+            if self.stats is not None:
+                self.stats.end_depth(depth)
+            # an interrupted search is only used if nothing else is available
+            if exit_type == SearchExit.TIME and results:
+                break
+            results[depth] = (value, best_move)
+            if exit_type == SearchExit.TIME:
+                break
+            if exit_type == SearchExit.FULL_DEPTH:
+                full_depth = True
+                break
+            depth += 1
+        self.root_moves = None
+        self.full_depth = True
+        return results, full_depth
+
     def search(self, board: Board, alpha, beta, depth, ply, move_values):
-        entry: TTEntry = self.transposition_table.retrieve(board._state)
-        if entry is not None and entry.depth >= depth:
+        stats = self.stats
+        entry: TTEntry = self.transposition_table.retrieve(board)
+        if stats is not None:
+            stats.nodes += 1
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        # a stored root entry may come from a search of other root moves
+        restricted = ply == 0 and self.root_moves is not None
+        if entry is not None and entry.depth >= depth and not restricted:
             # print("-------------------------visited-------------------------")
             if entry.node_type == EXACT:
-                return entry.best_value, entry.best_action, SearchExit.DEPTH
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return entry.best_value, entry.best_move, SearchExit.DEPTH
             elif entry.node_type == LOWER_BOUND and entry.best_value > alpha:
                 alpha = entry.best_value
             elif entry.node_type == UPPER_BOUND and entry.best_value < beta:
                 beta = entry.best_value
             if alpha >= beta:
-                return entry.best_value, entry.best_action, SearchExit.DEPTH
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return entry.best_value, entry.best_move, SearchExit.DEPTH
         
         if self.cutoff_test(board, depth):
             utility_value = board.eval_fn(ply)
-
-            print(board.render(use_color=True))
-            print("agent's color:", self.color)
-            print("turn color:", board.turn_color)
-            print("ply:", ply)
-            print("utility_value:", utility_value)
+            if stats is not None:
+                stats.leaves += 1
 
             if utility_value <= alpha:
                 self.transposition_table.store(board, LOWER_BOUND, depth, None, utility_value)
@@ -55,15 +98,17 @@ class PVSAgent(IterativeDeepeningAgent):
         
         best_action = None
         value = -np.inf
-        actions = board.get_legal_actions()
-        actions = OrderActions.order_actions(board, actions, self.transposition_table, move_values)
+        actions = self.root_moves if restricted else board.get_legal_moves()
+        actions = OrderActions.order_actions(board, actions, self.transposition_table, move_values, self.order_noise)
         actions = OrderActions.topk_actions(actions)
         pv_action = actions[0]
 
         # print("depth:", ply, "total number of actions", len((actions)))
+        if stats is not None:
+            stats.expand(ply, len(actions))
 
-        for action in actions:
-            mutation = board.apply_action(action)
+        for index, action in enumerate(actions):
+            mutation = board.apply_move(action)
             if action == pv_action:
                 action_value, best_action, search_exit_type = self.search(board, -beta, -alpha, depth - 1, ply + 1, move_values)
             else:
@@ -77,9 +122,9 @@ class PVSAgent(IterativeDeepeningAgent):
                 best_action = action
             alpha = max(action_value, alpha)
             if action_value >= beta:
-                print("----------------- prunned", len(actions)-actions.index(action)-1, "nodes")
+                if stats is not None:
+                    stats.cutoff(index)
                 break
-            print("action:", action, "action_value:", action_value)
             if self.has_time_left() == False:
                 search_exit_type = SearchExit.TIME
                 break
@@ -89,28 +134,13 @@ class PVSAgent(IterativeDeepeningAgent):
             node_type = LOWER_BOUND
         elif value >= beta:
             node_type = UPPER_BOUND
-
-        print("best_action:", best_action, "best_value:", value)
-        move_values[board._state.__hash__()] = value
+        move_values[board.zobrist_key] = value
         self.transposition_table.store(board, node_type, depth, best_action, value)
         return value, best_action, search_exit_type
 
 
-
-
-
-
-
-
-
-
-
-        
-
-
-    
-
-
-
-
-    
+# ______________________________________________________________________________
+class LazySMPPVSAgent(LazySMP, PVSAgent):
+    """
+    PVSAgent searching with Lazy SMP helper processes.
+    """
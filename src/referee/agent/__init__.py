@@ -10,7 +10,10 @@ from ..game import Action, PlayerColor, PlayerException
 from ..options import PlayerLoc, TIME_LIMIT_NOVALUE
 from .client import RemoteProcessClassClient, AsyncProcessStatus, \
     WrappedProcessException
-from .resources import ResourceLimitException
+from .io import PROTOCOL_BINARY
+from .pool import AgentProcessPool
+from .forkserver import AgentForkServer
+from .resources import ResourceLimitException, ACCOUNTING_STRICT
 
 RECV_TIMEOUT = TIME_LIMIT_NOVALUE # Max seconds for agent to reply (wall clock)
 
@@ -35,6 +38,10 @@ class AgentProxyPlayer(Player):
         log: LogStream = NullLogger(),
         intercept_exc_type: Type[Exception] = PlayerException,
         subproc_output: bool = True,
+        protocol: str = PROTOCOL_BINARY,
+        pool: AgentProcessPool | None = None,
+        fork_server: AgentForkServer | None = None,
+        accounting: str = ACCOUNTING_STRICT,
     ):
         '''
         Create an agent proxy player.
@@ -57,6 +64,17 @@ class AgentProxyPlayer(Player):
             caught from the agent process. 
         subproc_output: Whether to print the agent's stderr stream to the
             terminal. This is useful for debugging.
+        protocol: Interchange protocol with the agent process, either binary
+            frames (PROTOCOL_BINARY) or base64 lines (PROTOCOL_BASE64).
+        pool: Pool of agent processes to reuse from earlier games, and to
+            return the agent's process to after the game. If None, the agent
+            gets a fresh process, which ends with the game.
+        fork_server: Fork server to fork a fresh agent process from, with the
+            agent's modules already imported, rather than starting a new
+            Python interpreter.
+        accounting: Resource accounting mode of the agent process: "strict"
+            (for tournaments) or the lower-overhead "fast" (see
+            ACCOUNTING_MODES in resources.py).
         '''
         super().__init__(color)
 
@@ -72,6 +90,10 @@ class AgentProxyPlayer(Player):
             recv_timeout = RECV_TIMEOUT, 
             subproc_output = subproc_output,
             log = log,
+            protocol = protocol,
+            pool = pool,
+            fork_server = fork_server,
+            accounting = accounting,
             # Class constructor arguments (passed to agent)
             color = color
         )
@@ -79,6 +101,13 @@ class AgentProxyPlayer(Player):
         self._ret_symbol = f"⤷" if log.setting("unicode") else "->"
         self._InterceptExc = intercept_exc_type
 
+    @property
+    def status(self) -> AsyncProcessStatus | None:
+        """
+        Resource usage of the agent process as of its last reply.
+        """
+        return self._agent.status
+
     @contextmanager
     def _intercept_exc(self):
         try:
@@ -168,4 +197,6 @@ class AgentProxyPlayer(Player):
                         f"  {status.space_peak:7.3f}MB (peak usage)\n"
         else:
             space_str = "  space: unknown (check platform)\n"
-        return f"resources usage status:\n{time_str}{space_str}"
+        accounting_str = f"  accounting: {status.accounting_time:6.3f}s  "\
+                         f"(referee overhead, off the clock)\n"
+        return f"resources usage status:\n{time_str}{space_str}{accounting_str}"
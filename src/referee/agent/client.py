@@ -8,9 +8,13 @@ from asyncio.exceptions import TimeoutError as AIOTimeoutError
 from typing import Any
 
 from ..log import NullLogger, LogStream
-from .resources import ResourceLimitException
-from .io import AsyncProcessStatus, m_pickle, m_unpickle,\
-    _SUBPROC_MODULE, _ACK, _REPLY_OK, _REPLY_EXC, _CHUNK_LIMIT_KB
+from .resources import ResourceLimitException, ACCOUNTING_STRICT
+from .io import AsyncProcessStatus, m_pickle, m_unpickle, m_frame, \
+    m_async_unframe, PROTOCOL_BASE64, PROTOCOL_BINARY, \
+    _SUBPROC_MODULE, _ACK, _ACK_BINARY, _RENEW, _REPLY_OK, _REPLY_EXC, \
+    _CHUNK_LIMIT_KB
+from .pool import AgentProcessPool
+from .forkserver import AgentForkServer
 
 class WrappedProcessException(Exception):
     pass
@@ -29,6 +33,11 @@ class RemoteProcessClassClient:
         subproc_output: bool,
         *cons_args, 
         log: LogStream=NullLogger(),
+        protocol: str=PROTOCOL_BINARY,
+        out_of_band: bool=False,
+        pool: AgentProcessPool | None=None,
+        fork_server: AgentForkServer | None=None,
+        accounting: str=ACCOUNTING_STRICT,
         **cons_kwargs
     ):
         self._pkg = pkg
@@ -41,6 +50,14 @@ class RemoteProcessClassClient:
         self._log = log
         self._cons_args = cons_args
         self._cons_kwargs = cons_kwargs
+        assert protocol in (PROTOCOL_BASE64, PROTOCOL_BINARY)
+        self._protocol = protocol
+        self._out_of_band = out_of_band
+        self._pool = pool
+        self._fork_server = fork_server
+        self._accounting = accounting
+        # Whether binary frames are in use (once the subprocess has agreed)
+        self._binary = False
         self._proc: Process | None = None
         self._status: AsyncProcessStatus | None = None
         self._killed: bool = False
@@ -61,10 +78,17 @@ class RemoteProcessClassClient:
         self._log.debug(
             f"waiting for reply from subprocess {self._proc.pid} (stdout)")
         try:
-            line = await wait_for(
-                self._proc.stdout.readline(),
-                timeout=self._recv_timeout
-            )
+            if self._binary:
+                # (an incomplete frame raises an EOFError)
+                reply = await wait_for(
+                    m_async_unframe(self._proc.stdout.readexactly),
+                    timeout=self._recv_timeout
+                )
+            else:
+                line = await wait_for(
+                    self._proc.stdout.readline(),
+                    timeout=self._recv_timeout
+                )
         except AIOTimeoutError as e:
             # Process hasn't replied for a long time, kill it
             self._log.debug(
@@ -75,10 +99,12 @@ class RemoteProcessClassClient:
                 f"({self._recv_timeout}s) exceeded"
             ) from e
 
-        if not line:
-            raise EOFError("expected result, got EOF")
+        if not self._binary:
+            if not line:
+                raise EOFError("expected result, got EOF")
+            reply = m_unpickle(line)
 
-        return await self._process_reply(m_unpickle(line))
+        return await self._process_reply(reply)
 
     async def _process_reply(self, reply: tuple[Any, ...]):
         assert self._proc is not None
@@ -119,22 +145,71 @@ class RemoteProcessClassClient:
         await self._proc.wait()
         self._killed = True
 
+    async def _renew(self) -> bool:
+        """
+        Create the class instance on an idle process from the pool, if there
+        is one. Return whether this was done.
+        """
+        if self._pool is None:
+            return False
+        idle = self._pool.take(self._pkg, self._cls)
+        if idle is None:
+            return False
+        self._proc, self._binary = idle
+        assert self._proc.stdin is not None
+        self._log.debug(
+            f"initialising class '{self._pkg}:{self._cls}' "
+            f"on pooled subprocess {self._proc.pid}"
+        )
+        message = (_RENEW, (
+            self._pkg, self._cls,
+            self._time_limit, self._space_limit,
+            self._res_limit_tolerance,
+            self._accounting,
+            self._cons_args,
+            self._cons_kwargs
+        ), {})
+        if self._binary:
+            self._proc.stdin.writelines(m_frame(message, self._out_of_band))
+        else:
+            self._proc.stdin.write(m_pickle(message))
+        try:
+            assert await self._recv_reply() == _ACK
+        except:
+            self._log.debug(
+                f"exception occured during construction of class"
+            )
+            await self._graceful_exit()
+            raise
+        return True
+
     async def __aenter__(self):
+        if await self._renew():
+            return self
+
         # Start subprocess
-        self._proc = await create_subprocess_exec(
-            sys.executable, "-m", _SUBPROC_MODULE,
-            m_pickle((
-                self._pkg, self._cls,
-                self._time_limit, self._space_limit,
-                self._res_limit_tolerance,
-                self._cons_args, 
-                self._cons_kwargs
-            )),
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL if not self._subproc_output else None,
-            limit = _CHUNK_LIMIT_KB * 1000
-        )
+        args = m_pickle((
+            self._pkg, self._cls,
+            self._time_limit, self._space_limit,
+            self._res_limit_tolerance,
+            self._protocol, self._out_of_band,
+            self._accounting,
+            self._cons_args, 
+            self._cons_kwargs
+        ))
+        if self._fork_server is not None:
+            # Fork it from the server, with the modules already imported
+            self._proc = await self._fork_server.spawn(
+                args, self._subproc_output, limit = _CHUNK_LIMIT_KB * 1000)
+        else:
+            self._proc = await create_subprocess_exec(
+                sys.executable, "-m", _SUBPROC_MODULE,
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL if not self._subproc_output else None,
+                limit = _CHUNK_LIMIT_KB * 1000
+            )
         assert self._proc is not None
         assert self._proc.stdin is not None
         self._log.debug(f"subprocess {self._proc.pid} started")
@@ -145,7 +220,9 @@ class RemoteProcessClassClient:
                 f"initialising class '{self._pkg}:{self._cls}' "
                 f"on subprocess {self._proc.pid}"
             )
-            assert await self._recv_reply() == _ACK
+            ack = await self._recv_reply()
+            assert ack in (_ACK, _ACK_BINARY)
+            self._binary = ack == _ACK_BINARY
         except:
             # Exception during construction occured
             self._log.debug(
@@ -162,6 +239,14 @@ class RemoteProcessClassClient:
         if exc_type is not None:
             self._log.debug(f"an exception occured!")
 
+        # Keep the process for another game, unless anything went wrong (it
+        # may then have replies left unread)
+        if self._pool is not None and exc_type is None and not self._killed \
+                and self._proc.returncode is None:
+            self._log.debug(f"returning subprocess {self._proc.pid} to pool")
+            self._pool.put(self._pkg, self._cls, self._proc, self._binary)
+            return
+
         if not self._killed:
             # Gracefully end process by writing EOF to stdin
             await self._graceful_exit()
@@ -186,7 +271,11 @@ class RemoteProcessClassClient:
                 f"send method call request to subprocess "
                 f"{self._proc.pid} (stdin)"
             )
-            self._proc.stdin.write(m_pickle((name, args, kwargs)))
+            if self._binary:
+                self._proc.stdin.writelines(
+                    m_frame((name, args, kwargs), self._out_of_band))
+            else:
+                self._proc.stdin.write(m_pickle((name, args, kwargs)))
             return await self._recv_reply()
 
         return call
@@ -0,0 +1,272 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# A fork server for agent subprocesses. The server process imports the referee
+# and the agent modules once, then forks a child per agent, which runs the
+# usual subprocess entry point (see subprocess.py) on pipes passed to it by the
+# client. Children start in milliseconds with the modules already imported,
+# and share read-only tables (piece templates, placement masks, opening books,
+# ...) with the server and each other in copy-on-write memory.
+#
+# Note that memory used by the preloaded modules is part of the children's
+# baseline, so unlike in a fresh subprocess it is not counted against the
+# agent's space limit.
+
+import asyncio
+import gc
+import os
+import select
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+from importlib import import_module
+from traceback import print_exc
+
+# Modules imported by the server before any agent module
+_PRELOAD = ["referee", "referee.agent.subprocess", "utils.board"]
+_READY = b"READY\n"
+_PID = struct.Struct("<i")
+_MAX_PAYLOAD = 1 << 20
+# The server is started with -c rather than -m, as the module is already
+# imported by the referee.agent package
+_SERVER_COMMAND = "import sys; from referee.agent.forkserver import serve; " \
+    "serve(sys.argv[1], sys.argv[2:])"
+
+
+class ForkedProcess:
+    """
+    A child of the fork server, with the interface of `asyncio.subprocess
+    .Process` used by `RemoteProcessClassClient`. The child is not a child of
+    the client, so its exit status is sent over the connection on which it
+    was requested.
+    """
+
+    def __init__(self,
+        pid: int,
+        conn: socket.socket,
+        stdin: asyncio.StreamWriter,
+        stdout: asyncio.StreamReader,
+    ):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.returncode: int | None = None
+        self._conn = conn
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    async def wait(self) -> int:
+        if self.returncode is None:
+            loop = asyncio.get_running_loop()
+            data = await loop.sock_recv(self._conn, _PID.size)
+            # (an unknown status if the server has already exited)
+            self.returncode = _PID.unpack(data)[0] \
+                if len(data) == _PID.size else -1
+            self._conn.close()
+            self.stdin.close()
+        return self.returncode
+
+
+class AgentForkServer:
+    """
+    Client of a fork server. Without a `path`, a new server is started,
+    preloading the given modules (typically the agent packages), and is shut
+    down by `close`. With a `path`, the client connects to the server already
+    listening there, e.g. one started by another process.
+    """
+
+    def __init__(self, preload: list[str] = [], path: str | None = None):
+        self._server: subprocess.Popen | None = None
+        self._dir: tempfile.TemporaryDirectory | None = None
+        if path is not None:
+            self.path = path
+            return
+
+        self._dir = tempfile.TemporaryDirectory(prefix="referee-")
+        self.path = os.path.join(self._dir.name, "forkserver")
+        self._server = subprocess.Popen(
+            [sys.executable, "-c", _SERVER_COMMAND, self.path, *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert self._server.stdout is not None
+        if self._server.stdout.readline() != _READY:
+            self.close()
+            raise RuntimeError("fork server failed to start")
+
+    def close(self):
+        """
+        Shut down the server, if this client started it. Children already
+        forked carry on.
+        """
+        if self._server is not None:
+            assert self._server.stdin is not None
+            self._server.stdin.close()
+            self._server.wait()
+            self._server = None
+        if self._dir is not None:
+            self._dir.cleanup()
+            self._dir = None
+
+    async def spawn(self,
+        payload: bytes,
+        subproc_output: bool,
+        limit: int,
+    ) -> ForkedProcess:
+        """
+        Fork an agent subprocess running with the given (pickled) command
+        line argument, and return it.
+        """
+        loop = asyncio.get_running_loop()
+        in_r, in_w = os.pipe()
+        out_r, out_w = os.pipe()
+        err = os.dup(sys.stderr.fileno()) if subproc_output \
+            else os.open(os.devnull, os.O_WRONLY)
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            conn.connect(self.path)
+            socket.send_fds(conn, [payload], [in_r, out_w, err])
+            data = conn.recv(_PID.size)
+        except:
+            conn.close()
+            os.close(in_w)
+            os.close(out_r)
+            raise
+        finally:
+            os.close(in_r)
+            os.close(out_w)
+            os.close(err)
+        if len(data) != _PID.size:
+            conn.close()
+            raise RuntimeError("fork server did not start the agent process")
+        pid, = _PID.unpack(data)
+        conn.setblocking(False)
+
+        stdout = asyncio.StreamReader(limit=limit, loop=loop)
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(stdout, loop=loop),
+            open(out_r, "rb", buffering=0))
+        transport, protocol = await loop.connect_write_pipe(
+            lambda: asyncio.streams.FlowControlMixin(loop=loop),
+            open(in_w, "wb", buffering=0))
+        stdin = asyncio.StreamWriter(transport, protocol, None, loop)
+        return ForkedProcess(pid, conn, stdin, stdout)
+
+
+def _run_agent(payload: bytes, fds: list[int]):
+    """
+    Run the agent subprocess entry point in a forked child, on the stdin,
+    stdout and stderr file descriptors sent by the client.
+    """
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, "r")
+    sys.stdout = open(1, "w")
+    sys.stderr = open(2, "w")
+    sys.argv = [sys.argv[0], payload.decode("ascii")]
+
+    from .subprocess import main
+    code = 0
+    try:
+        main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except KeyboardInterrupt:
+        pass
+    except BaseException:
+        print_exc()
+        code = 1
+    os._exit(code)
+
+
+def serve(path: str, modules: list[str]):
+    """
+    Preload modules, then fork an agent subprocess for each request on the
+    socket at `path`, until stdin is closed.
+    """
+    for name in _PRELOAD + modules:
+        try:
+            import_module(name)
+        except Exception as e:
+            print(f"fork server: cannot preload {name}: {e}", file=sys.stderr)
+    # keep the preloaded objects out of the garbage collector's reach, so
+    # that collections in the children do not copy their pages
+    gc.freeze()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    listener.bind(path)
+    listener.listen()
+
+    # exit statuses are reported to the connection that requested the child
+    children: dict[int, socket.socket] = {}
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+
+    sys.stdout.buffer.write(_READY)
+    sys.stdout.flush()
+    stdin = sys.stdin.fileno()
+
+    while True:
+        try:
+            readable, _, _ = select.select([listener, wake_r, stdin], [], [])
+        except InterruptedError:
+            continue
+
+        if wake_r in readable:
+            os.read(wake_r, 4096)
+            while True:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                conn = children.pop(pid, None)
+                if conn is not None:
+                    try:
+                        conn.send(_PID.pack(os.waitstatus_to_exitcode(status)))
+                    except OSError:
+                        pass
+                    conn.close()
+
+        if stdin in readable and not os.read(stdin, 4096):
+            # the owner has closed the pipe
+            break
+
+        if listener in readable:
+            conn, _ = listener.accept()
+            payload, fds, _, _ = socket.recv_fds(conn, _MAX_PAYLOAD, 3)
+            if len(fds) != 3:
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+                continue
+            pid = os.fork()
+            if pid == 0:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                for fd in (wake_r, wake_w):
+                    os.close(fd)
+                for other in children.values():
+                    other.close()
+                listener.close()
+                conn.close()
+                _run_agent(payload, fds)
+            for fd in fds:
+                os.close(fd)
+            conn.send(_PID.pack(pid))
+            children[pid] = conn
+
+    listener.close()
+    os.unlink(path)
+
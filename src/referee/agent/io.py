@@ -4,17 +4,34 @@
 import binascii
 from contextlib import contextmanager
 import pickle
+import struct
 from dataclasses import dataclass
 from binascii import b2a_base64, a2b_base64
-from typing import Any
+from typing import Any, Callable
 
 
 _SUBPROC_MODULE = "referee.agent.subprocess"
 _ACK = "ACK"
+_ACK_BINARY = "ACK_BINARY"
+# Method name of the message replacing the instance of a pooled process
+_RENEW = "__renew__"
 _REPLY_OK = b"OK"
 _REPLY_EXC = b"EXC"
 _CHUNK_LIMIT_KB = 1024
 
+# Interchange protocols. Messages are either pickled, base64-encoded and sent
+# one per line, or sent as binary frames. The client asks for a protocol when
+# starting the subprocess, and the subprocess's first reply (always a base64
+# line) acknowledges with _ACK_BINARY if both sides then switch to frames.
+PROTOCOL_BASE64 = "base64"
+PROTOCOL_BINARY = "binary"
+
+# A binary frame is a header giving the length of a protocol 5 pickle and the
+# number of out-of-band buffers, the pickle itself, then each buffer prefixed
+# by its length.
+_FRAME_HEADER = struct.Struct("<II")
+_BUFFER_HEADER = struct.Struct("<Q")
+
 
 class InterchangeException(Exception):
     pass
@@ -27,6 +44,8 @@ class AsyncProcessStatus:
     space_known: bool
     space_curr: float
     space_peak: float
+    # CPU time (s) the agent process spent on resource accounting, off the clock
+    accounting_time: float = 0.0
 
 
 @contextmanager
@@ -47,3 +66,47 @@ def m_pickle(o: Any) -> bytes:
 def m_unpickle(b: bytes) -> Any:
     with catch_exceptions("unpickle", b):
         return pickle.loads(a2b_base64(b))
+
+def m_frame(o: Any, out_of_band: bool = False) -> list[bytes | memoryview]:
+    """
+    Return the chunks of the binary frame of an object, to be written in
+    order. If `out_of_band` is set, buffers supporting it (e.g. those of numpy
+    arrays) are sent as they are rather than copied into the pickle.
+    """
+    buffers = []
+    with catch_exceptions("pickle", o):
+        data = pickle.dumps(o, protocol=5,
+            buffer_callback=buffers.append if out_of_band else None)
+    chunks = [_FRAME_HEADER.pack(len(data), len(buffers)), data]
+    for buffer in buffers:
+        raw = buffer.raw()
+        chunks += [_BUFFER_HEADER.pack(raw.nbytes), raw]
+    return chunks
+
+def m_unframe(read: Callable[[int], bytes]) -> Any:
+    """
+    Read a binary frame with a function returning exactly the given number of
+    bytes, and return the object it holds.
+    """
+    size, num_buffers = _FRAME_HEADER.unpack(read(_FRAME_HEADER.size))
+    data = read(size)
+    buffers = []
+    for _ in range(num_buffers):
+        buffer_size, = _BUFFER_HEADER.unpack(read(_BUFFER_HEADER.size))
+        buffers.append(read(buffer_size))
+    with catch_exceptions("unpickle", data):
+        return pickle.loads(data, buffers=buffers)
+
+async def m_async_unframe(read: Callable[[int], Any]) -> Any:
+    """
+    Asynchronous version of `m_unframe`, reading with a coroutine function
+    (e.g. `StreamReader.readexactly`).
+    """
+    size, num_buffers = _FRAME_HEADER.unpack(await read(_FRAME_HEADER.size))
+    data = await read(size)
+    buffers = []
+    for _ in range(num_buffers):
+        buffer_size, = _BUFFER_HEADER.unpack(await read(_BUFFER_HEADER.size))
+        buffers.append(await read(buffer_size))
+    with catch_exceptions("unpickle", data):
+        return pickle.loads(data, buffers=buffers)
@@ -0,0 +1,52 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from asyncio.subprocess import Process
+
+
+class AgentProcessPool:
+    """
+    Agent subprocesses kept alive between games. A `RemoteProcessClassClient`
+    given a pool takes an idle process of the same agent class if there is
+    one, and creates a fresh instance of the class on it (with its resource
+    counters reset) instead of starting a new process, and hands its process
+    back to the pool when the game is over.
+
+    Processes are tied to the event loop that started them, so a pool must
+    only be used from a single event loop. Module-level state of an agent
+    package (e.g. caches, random state) persists from game to game.
+    """
+
+    def __init__(self):
+        # idle processes, and whether they use binary frames, per agent class
+        self._idle: dict[tuple[str, str], list[tuple[Process, bool]]] = {}
+
+    def take(self, pkg: str, cls: str) -> tuple[Process, bool] | None:
+        """
+        Return an idle process of an agent class and whether it uses binary
+        frames, or None if there is none.
+        """
+        idle = self._idle.get((pkg, cls))
+        while idle:
+            proc, binary = idle.pop()
+            if proc.returncode is None:
+                return proc, binary
+        return None
+
+    def put(self, pkg: str, cls: str, proc: Process, binary: bool):
+        """
+        Hand back the process of an agent class after a game.
+        """
+        self._idle.setdefault((pkg, cls), []).append((proc, binary))
+
+    async def close(self):
+        """
+        Gracefully end all idle processes.
+        """
+        for idle in self._idle.values():
+            for proc, _ in idle:
+                if proc.returncode is None:
+                    assert proc.stdin is not None
+                    proc.stdin.write_eof()
+                    await proc.wait()
+        self._idle = {}
@@ -6,6 +6,18 @@ import time
 from pathlib import Path
 
 
+# Resource accounting modes. In "strict" mode, garbage is collected before and
+# memory usage measured after every call into the agent. In "fast" mode,
+# garbage is only collected off the clock when the collector is due for a full
+# collection anyway, and memory usage is only measured every
+# MEMORY_SAMPLE_INTERVAL calls (the peak usage is the process's own, so a
+# breach of the limit is still caught, at most that many calls late).
+ACCOUNTING_STRICT = "strict"
+ACCOUNTING_FAST = "fast"
+ACCOUNTING_MODES = [ACCOUNTING_STRICT, ACCOUNTING_FAST]
+MEMORY_SAMPLE_INTERVAL = 8
+
+
 class ResourceLimitException(Exception):
     """For when agents exceed specified time / space limits."""
 
@@ -19,17 +31,21 @@ class CountdownTimer:
       after the allocated time has passed
     """
 
-    def __init__(self, time_limit, tolerance=1.0):
+    def __init__(self, time_limit, tolerance=1.0, accounting=ACCOUNTING_STRICT):
         """
         Create a new countdown timer with time limit `limit`, in seconds
         (0 for unlimited time). If `tolerance` is specified, the timer will
         allow the process to run for `tolerance` times the specified limit
-        before throwing an exception.
+        before throwing an exception. `accounting` is the accounting mode
+        (see ACCOUNTING_MODES).
         """
+        assert accounting in ACCOUNTING_MODES
         self._limit = time_limit
         self._tolerance = tolerance
+        self._strict = accounting == ACCOUNTING_STRICT
         self._clock = 0
         self._delta = 0
+        self._overhead = 0
 
     def total(self):
         return self._clock
@@ -37,11 +53,18 @@ class CountdownTimer:
     def delta(self):
         return self._delta
 
+    def overhead(self):
+        """CPU time spent collecting garbage off the clock, in seconds."""
+        return self._overhead
+
     def __enter__(self):
         # clean up memory off the clock
-        gc.collect()
+        start = time.process_time()
+        if self._strict or _full_collection_due():
+            gc.collect()
         # then start timing
         self.start = time.process_time()
+        self._overhead += self.start - start
         return self  # unused
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -68,11 +91,31 @@ class MemoryWatcher:
       context if the memory limit has been breached
     """
 
-    def __init__(self, space_limit, tolerance=1.0):
+    def __init__(self, space_limit, tolerance=1.0, accounting=ACCOUNTING_STRICT):
+        assert accounting in ACCOUNTING_MODES
         self._limit = space_limit
         self._tolerance = tolerance
+        self._interval = 1 if accounting == ACCOUNTING_STRICT \
+            else MEMORY_SAMPLE_INTERVAL
+        # calls left until usage is next measured
+        self._calls_to_sample = 0
+        self._overhead = 0
         self._curr_usage = -1
         self._peak_usage = -1
+        # peak usage of the process when the watcher was reset (see reset)
+        self._reset_peak = -1
+
+    def reset(self):
+        """
+        Measure usage from now on only, e.g. for a new agent in a process
+        reused from an earlier game. The process's own peak cannot be reset,
+        so until it is exceeded the peak is the highest usage measured on
+        exiting the context, which may miss short-lived peaks within it.
+        """
+        self._curr_usage = -1
+        self._peak_usage = -1
+        if _SPACE_ENABLED:
+            _, self._reset_peak = _get_space_usage()
 
     def curr(self):
         return self._curr_usage
@@ -83,6 +126,10 @@ class MemoryWatcher:
     def enabled(self):
         return _SPACE_ENABLED
 
+    def overhead(self):
+        """CPU time spent measuring memory usage, in seconds."""
+        return self._overhead
+
     def __enter__(self):
         return self  # unused
 
@@ -91,8 +138,15 @@ class MemoryWatcher:
         Check up on the current and peak space usage of the process, printing
         stats and ensuring that peak usage is not exceeding limits
         """
-        if _SPACE_ENABLED:
-            self._curr_usage, self._peak_usage = _get_space_usage()
+        self._calls_to_sample -= 1
+        if _SPACE_ENABLED and self._calls_to_sample <= 0:
+            self._calls_to_sample = self._interval
+            start = time.process_time()
+            curr_usage, peak_usage = _get_space_usage()
+            self._overhead += time.process_time() - start
+            if peak_usage <= self._reset_peak:
+                peak_usage = max(curr_usage, self._peak_usage + _DEFAULT_MEM_USAGE)
+            self._curr_usage, self._peak_usage = curr_usage, peak_usage
 
             # adjust measurements to reflect usage of agents and referee, not
             # the Python interpreter itself
@@ -107,6 +161,14 @@ class MemoryWatcher:
                     )
 
 
+def _full_collection_due():
+    """
+    Whether the garbage collector's next collection may be a full one.
+    """
+    _, _, gen1_collections = gc.get_count()
+    return gen1_collections >= gc.get_threshold()[2] - 1
+
+
 def _get_space_usage():
     """
     Find the current and peak Virtual Memory usage of the current process,
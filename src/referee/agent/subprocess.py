@@ -1,6 +1,7 @@
 # COMP30024 Artificial Intelligence, Semester 1 2024
 # Project Part B: Game Playing Agent
 
+import gc
 import sys
 from contextlib import contextmanager
 from importlib import import_module
@@ -9,8 +10,8 @@ from traceback import format_exc
 from typing import Any
 
 from .resources import CountdownTimer, MemoryWatcher, set_space_line
-from .io import AsyncProcessStatus, m_pickle, m_unpickle,\
-    _ACK, _REPLY_OK, _REPLY_EXC
+from .io import AsyncProcessStatus, m_pickle, m_unpickle, m_frame, m_unframe,\
+    PROTOCOL_BINARY, _ACK, _ACK_BINARY, _RENEW, _REPLY_OK, _REPLY_EXC
 
 _STDOUT_OVERRIDE_MESSAGE = "stdout usage is not allowed in agent (use stderr)"
 _STDIN_OVERRIDE_MESSAGE = "stdin usage is not allowed in agent"
@@ -70,12 +71,18 @@ def main():
     cls_module, cls_name, \
         time_limit, space_limit, \
         res_limit_tolerance, \
+        protocol, out_of_band, \
+        accounting, \
         cons_args, cons_kwargs \
         = _s_unpickle(sys.argv[1])
 
+    # Messages are base64 lines until the constructor reply, and binary frames
+    # afterwards if the client asked for them
+    binary = False
+
     # Create some context managers for resource tracking
-    timer = CountdownTimer(time_limit, res_limit_tolerance)
-    space = MemoryWatcher(space_limit, res_limit_tolerance)
+    timer = CountdownTimer(time_limit, res_limit_tolerance, accounting)
+    space = MemoryWatcher(space_limit, res_limit_tolerance, accounting)
 
     def _get_status():
         return AsyncProcessStatus(
@@ -84,6 +91,7 @@ def main():
             space_known=space.enabled(),
             space_curr=space.curr(),
             space_peak=space.peak(),
+            accounting_time=timer.overhead() + space.overhead(),
         )
 
     def _referee():
@@ -99,7 +107,15 @@ def main():
         }
 
     # Comms functions
+    def _read_exactly(size: int) -> bytes:
+        data = in_stream.buffer.read(size)
+        if len(data) < size: # EOF, process should exit (see __aexit__ above)
+            exit(0)
+        return data
+
     def _recv() -> Any:
+        if binary:
+            return m_unframe(_read_exactly)
         line = in_stream.readline()
         if not line: # EOF, process should exit (see __aexit__ above)
             exit(0)
@@ -107,8 +123,13 @@ def main():
 
     def _reply(*args: Any):
         # Reply is a tuple of (status, arg0, arg1, ...)
-        out_stream.write(_s_pickle((_get_status(), *args)))
-        out_stream.flush()
+        reply = (_get_status(), *args)
+        if binary:
+            out_stream.buffer.writelines(m_frame(reply, out_of_band))
+            out_stream.buffer.flush()
+        else:
+            out_stream.write(_s_pickle(reply))
+            out_stream.flush()
 
     @contextmanager
     def _relay_exceptions():
@@ -128,13 +149,45 @@ def main():
         set_space_line()
         Cls = getattr(import_module(cls_module), cls_name)
         instance = Cls(*cons_args, **{**cons_kwargs, **_referee()})
-    _reply(_REPLY_OK, _ACK)
+    if protocol == PROTOCOL_BINARY:
+        _reply(_REPLY_OK, _ACK_BINARY)
+        binary = True
+    else:
+        _reply(_REPLY_OK, _ACK)
 
     # Main client subprocess loop
     while True:
         message = _recv()
         name, args, kwargs = message
-        
+
+        # Replace the instance by a new one, for a new game in a pooled process
+        if name == _RENEW:
+            cls_module, cls_name, \
+                time_limit, space_limit, \
+                res_limit_tolerance, \
+                accounting, \
+                cons_args, cons_kwargs \
+                = args
+            old_instance, instance = instance, None
+            with _relay_exceptions():
+                # tear down the old instance, which may have started processes
+                # of its own (e.g. search workers), and collect it, off the
+                # clock
+                if callable(getattr(old_instance, "close", None)):
+                    old_instance.close()
+                old_instance = None
+                gc.collect()
+                timer = CountdownTimer(
+                    time_limit, res_limit_tolerance, accounting)
+                space = MemoryWatcher(
+                    space_limit, res_limit_tolerance, accounting)
+                space.reset()
+                with timer, space:
+                    Cls = getattr(import_module(cls_module), cls_name)
+                    instance = Cls(*cons_args, **{**cons_kwargs, **_referee()})
+                _reply(_REPLY_OK, _ACK)
+            continue
+
         # Call method
         result = None
         with _relay_exceptions(), timer, space:
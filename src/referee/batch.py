@@ -0,0 +1,271 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+# Batch mode of the referee: play many games between two agents across a pool
+# of worker processes, and write the result of each game as a line of JSON.
+# For usage, run:
+#
+#   python -m referee.batch --help
+#
+# Unlike running `python -m referee` once per game, the worker interpreters
+# (with the referee and numpy already imported) are reused from game to game,
+# as are the agent processes (see AgentProcessPool) unless --no-pool is given,
+# and nothing but the results is printed. With --fork-server, new agent
+# processes are forked from a single server with the agent modules preloaded
+# (see AgentForkServer) instead of starting new interpreters.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .game import game, PlayerColor, TurnEnd, PlayerError, GameEnd
+from .agent import AgentProxyPlayer, AgentProcessPool, AgentForkServer
+from .agent.resources import ACCOUNTING_FAST
+from .options import PackageSpecAction, PlayerLoc, \
+    SPACE_LIMIT_NOVALUE, TIME_LIMIT_NOVALUE, ACCOUNTING_CHOICES
+
+GAMES_DEFAULT = 100
+# batches are for testing, so default to the cheaper resource accounting
+ACCOUNTING_DEFAULT = ACCOUNTING_FAST
+
+# event loop, agent process pool and fork server client of a worker process,
+# kept from game to game (the agent processes are tied to the loop that
+# started them)
+_loop: asyncio.AbstractEventLoop | None = None
+_pool: AgentProcessPool | None = None
+_fork_server: AgentForkServer | None = None
+
+
+def _init_worker(use_pool: bool, fork_server_path: str | None):
+    global _loop, _pool, _fork_server
+    _loop = asyncio.new_event_loop()
+    _pool = AgentProcessPool() if use_pool else None
+    if fork_server_path is not None:
+        _fork_server = AgentForkServer(path=fork_server_path)
+
+
+async def _play(
+    locs: dict[PlayerColor, PlayerLoc],
+    time_limit: float,
+    space_limit: float,
+    agent_output: bool,
+    accounting: str,
+) -> dict:
+    """
+    Play a game between agents at the given locations, and return its result.
+    """
+    players = {
+        color: AgentProxyPlayer(
+            f"{color} [{loc}]",
+            color,
+            loc,
+            time_limit=time_limit,
+            space_limit=space_limit,
+            subproc_output=agent_output,
+            pool=_pool,
+            fork_server=_fork_server,
+            accounting=accounting,
+        )
+        for color, loc in locs.items()
+    }
+    result = {"winner": None, "turns": 0, "error": None}
+    async for update in game(players[PlayerColor.RED], players[PlayerColor.BLUE]):
+        match update:
+            case TurnEnd(turn_id, _, _):
+                result["turns"] = turn_id
+            case PlayerError(message):
+                result["error"] = message
+            case GameEnd(winner):
+                if winner is not None:
+                    result["winner"] = str(winner.color)
+
+    # CPU time, peak memory and accounting overhead as last reported by each
+    # agent process
+    result["players"] = {}
+    for color, player in players.items():
+        status = player.status
+        result["players"][str(color)] = {
+            "agent": str(locs[color]),
+            "time_used": status.time_used if status is not None else None,
+            "space_peak": status.space_peak
+                if status is not None and status.space_known else None,
+            "accounting_time":
+                status.accounting_time if status is not None else None,
+        }
+    return result
+
+
+def play_game(
+    index: int,
+    red: PlayerLoc,
+    blue: PlayerLoc,
+    time_limit: float,
+    space_limit: float,
+    agent_output: bool = False,
+    accounting: str = ACCOUNTING_DEFAULT,
+) -> dict:
+    """
+    Play one game of a batch in a worker process, and return its result.
+    An unhandled error (e.g. an agent failing to start) is recorded in the
+    result rather than ending the batch.
+    """
+    start = time.time()
+    locs = {PlayerColor.RED: red, PlayerColor.BLUE: blue}
+    try:
+        result = _loop.run_until_complete(
+            _play(locs, time_limit, space_limit, agent_output, accounting))
+    except Exception as e:
+        result = {"winner": None, "turns": 0, "error": f"UNHANDLED: {e}"}
+    winner = result["winner"]
+    return {
+        "game": index,
+        "red": str(red),
+        "blue": str(blue),
+        **result,
+        "winner_agent": str(locs[PlayerColor[winner]]) if winner else None,
+        "wall_time": time.time() - start,
+    }
+
+
+def run_batch(
+    agents: tuple[PlayerLoc, PlayerLoc],
+    num_games: int,
+    num_workers: int,
+    time_limit: float,
+    space_limit: float,
+    agent_output: bool = False,
+    use_pool: bool = True,
+    use_fork_server: bool = False,
+    accounting: str = ACCOUNTING_DEFAULT,
+):
+    """
+    Play a batch of games between two agents, alternating colours so that
+    the first agent plays red in the even-numbered games, and yield the
+    results as the games finish.
+    """
+    # a single fork server is shared by all the workers
+    fork_server = AgentForkServer(preload=list({loc.pkg for loc in agents})) \
+        if use_fork_server else None
+    try:
+        with ProcessPoolExecutor(
+                num_workers, initializer=_init_worker,
+                initargs=(use_pool, fork_server and fork_server.path)) \
+                as executor:
+            futures = []
+            for index in range(num_games):
+                red, blue = agents if index % 2 == 0 else agents[::-1]
+                futures.append(executor.submit(
+                    play_game, index, red, blue, time_limit, space_limit,
+                    agent_output, accounting))
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        if fork_server is not None:
+            fork_server.close()
+
+
+def get_options():
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="referee.batch",
+        description="Play a batch of games between two Agent classes, "
+        "alternating colours, and write the result of each game as a line of "
+        "JSON.",
+    )
+    for num in (1, 2):
+        parser.add_argument(
+            f"agent{num}_loc",
+            metavar=f"AGENT{num}",
+            action=PackageSpecAction,
+            help=f"location of agent {num}'s Agent class (plays red first)"
+            if num == 1 else f"location of agent {num}'s Agent class",
+        )
+    parser.add_argument(
+        "-n", "--games", type=int, default=GAMES_DEFAULT,
+        help="number of games to play (default: %(default)s).")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help="number of games played at once (default: number of CPUs). "
+        "Note that each game runs two agent processes, and agents may start "
+        "worker processes of their own.")
+    parser.add_argument(
+        "-t", "--time", metavar="time_limit", type=float,
+        default=TIME_LIMIT_NOVALUE,
+        help="limit on CPU time (float, seconds) for each agent "
+        "(default: %(default)s, 0 for no limit).")
+    parser.add_argument(
+        "-s", "--space", metavar="space_limit", type=float,
+        default=SPACE_LIMIT_NOVALUE,
+        help="limit on memory space (float, MB) for each agent "
+        "(default: %(default)s, 0 for no limit).")
+    parser.add_argument(
+        "-o", "--output", metavar="FILE",
+        help="append the results to this file instead of writing them to "
+        "stdout.")
+    parser.add_argument(
+        "--no-pool", dest="pool", action="store_false",
+        help="start fresh agent processes for every game, rather than "
+        "reusing them from game to game.")
+    parser.add_argument(
+        "--fork-server", action="store_true",
+        help="fork new agent processes from a server with the agent modules "
+        "already imported, rather than starting new interpreters (memory used "
+        "by the agent modules at import is then not counted against the "
+        "space limit).")
+    parser.add_argument(
+        "-A", "--accounting", choices=ACCOUNTING_CHOICES,
+        default=ACCOUNTING_DEFAULT,
+        help="resource accounting mode for each agent (default: %(default)s; "
+        "use strict to enforce the limits as in a tournament).")
+    parser.add_argument(
+        "--agent-output", action="store_true",
+        help="show the agents' output (stderr), which is hidden by default.")
+    return parser.parse_args()
+
+
+def main():
+    options = get_options()
+    agents = (options.agent1_loc, options.agent2_loc)
+    out = open(options.output, "a") if options.output else sys.stdout
+
+    # tally of wins, losses and draws of each agent, by its position on the
+    # command line (both may be the same agent), and of games with errors
+    tally = [[0, 0, 0], [0, 0, 0]]
+    errors = 0
+    start = time.time()
+    try:
+        for result in run_batch(
+                agents, options.games, options.jobs, options.time,
+                options.space, options.agent_output, options.pool,
+                options.fork_server, options.accounting):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result["winner"] is None:
+                for counts in tally:
+                    counts[2] += 1
+            else:
+                # the first agent plays red in the even-numbered games
+                red = result["game"] % 2
+                winner = red if result["winner"] == str(PlayerColor.RED) \
+                    else 1 - red
+                tally[winner][0] += 1
+                tally[1 - winner][1] += 1
+            errors += result["error"] is not None
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    # the summary goes to stderr, keeping stdout for the results
+    print(f"{options.games} games in {time.time() - start:.1f}s "
+          f"({errors} with errors)", file=sys.stderr)
+    for num, (loc, (wins, losses, draws)) in enumerate(zip(agents, tally), 1):
+        print(f"  agent {num} [{loc}]: {wins} wins, {losses} losses, "
+              f"{draws} draws", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
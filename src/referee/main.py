@@ -96,7 +96,8 @@ def main(options: Namespace|None=None):
                 player_loc,
                 time_limit=options.time,
                 space_limit=options.space,
-                log=LogStream(f"player{p_num}", LogColor[str(player_color)])
+                log=LogStream(f"player{p_num}", LogColor[str(player_color)]),
+                accounting=options.accounting,
             )
             agents[p] = {
                 "name": player_name,
@@ -123,6 +124,14 @@ def main(options: Namespace|None=None):
         
         result = asyncio.get_event_loop().run_until_complete(_run(options))
 
+        # Report the referee's resource accounting overhead for each agent
+        for p, agent in agents.items():
+            status = p.status
+            if status is not None:
+                rl.info(f"{agent['name']} used {status.time_used:.3f}s of "
+                        f"CPU time, plus {status.accounting_time:.3f}s of "
+                        f"resource accounting off the clock")
+
         # Print the final result under all circumstances
         if result is None:
             rl.critical("result: draw")
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 import sys
 import argparse
 from .game import PlayerColor, GAME_NAME, NUM_PLAYERS
+from .agent.resources import ACCOUNTING_MODES, ACCOUNTING_STRICT
 
 
 # Program information:
@@ -42,6 +43,10 @@ VERBOSITY_NOVALUE = 3  # highest level, additional debug info
 LOGFILE_DEFAULT = None
 LOGFILE_NOVALUE = "game.log"
 
+# resource accounting modes (see referee/agent/resources.py)
+ACCOUNTING_CHOICES = ACCOUNTING_MODES
+ACCOUNTING_DEFAULT = ACCOUNTING_STRICT
+
 PKG_SPEC_HELP = """
 The required positional arguments RED and BLUE are 'package specifications'.
 These specify which Python package/module to import and search for a class
@@ -133,6 +138,17 @@ def get_options():
         help="limit on CPU time (float, seconds) for each agent.",
     )
 
+    optionals.add_argument(
+        "-A",
+        "--accounting",
+        choices=ACCOUNTING_CHOICES,
+        default=ACCOUNTING_DEFAULT,
+        help="resource accounting mode for each agent. strict: (default) "
+        "collect garbage before and measure memory after every call into "
+        "the agent; fast: collect garbage only when a full collection is due "
+        "and measure memory periodically, for less referee overhead.",
+    )
+
     verbosity_group = optionals.add_mutually_exclusive_group()
     verbosity_group.add_argument(
         "-d",
@@ -1,8 +1,5 @@
 #!/bin/bash
 
-output_file="testing/habp-vs-greedyactions.txt"
+output_file="testing/habp-vs-greedyactions.jsonl"
 
-for i in $(seq 1 100)
-do
-    echo "GAME ${i}: $(python3 -m referee -s 250 -t 180 habp_agent greedy_legal_actions_agent -v 0)" | tee -a "$output_file"
-done
\ No newline at end of file
+python3 -m referee.batch habp_agent greedy_legal_actions_agent -n 100 -s 250 -t 180 -o "$output_file"
@@ -0,0 +1,59 @@
+import os
+import unittest
+
+from referee import batch
+from referee.options import PlayerLoc
+
+WORKERS_AGENT = PlayerLoc("tests.workers_agent", "Agent")
+
+
+def descendants(pid: int) -> set[int]:
+    """
+    Return the live descendants of a process, read from /proc.
+    """
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # the command name may contain spaces, but is in parentheses
+                fields = file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if fields[0] != "Z":
+            children.setdefault(int(fields[1]), []).append(int(entry))
+    found, stack = set(), [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.add(child)
+            stack.append(child)
+    return found
+
+
+@unittest.skipUnless(os.path.isdir("/proc"), "needs /proc")
+class TestAgentProcessPool(unittest.TestCase):
+    def setUp(self):
+        # play the games in this process, as a batch worker would
+        batch._init_worker(use_pool=True, fork_server_path=None)
+
+    def tearDown(self):
+        batch._loop.run_until_complete(batch._pool.close())
+        batch._loop.close()
+        batch._loop = batch._pool = None
+
+    def test_renew_stops_workers_of_old_agent(self):
+        counts = []
+        for index in range(4):
+            result = batch.play_game(
+                index, WORKERS_AGENT, WORKERS_AGENT, 0, 0, accounting="fast")
+            self.assertIsNone(result["error"])
+            counts.append(len(descendants(os.getpid())))
+        # two pooled agent processes, each with the workers of its current
+        # agent only (and any helper processes of multiprocessing), however
+        # many games they have played
+        self.assertEqual(len(set(counts)), 1, counts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from referee.game import PlayerColor
+from mtdf_agent.program import Agent
+from utils.openingbook import OpeningBook
+from utils.placements import PLACEMENT_ACTIONS
+
+
+class TestOpeningBook(unittest.TestCase):
+    def test_mtdf_agent_plays_book_moves(self):
+        book = OpeningBook()
+        agents = {color: Agent(color) for color in PlayerColor}
+        try:
+            # follow the book for both players while it has moves
+            positions = 0
+            while True:
+                color = agents[PlayerColor.RED].board.turn_color
+                book_move = book.lookup(agents[color].board)
+                if book_move is None:
+                    break
+                action = agents[color].action(
+                    time_remaining=180, space_remaining=250, space_limit=250)
+                self.assertEqual(action, PLACEMENT_ACTIONS[book_move])
+                for agent in agents.values():
+                    agent.update(color, action)
+                positions += 1
+            self.assertGreater(positions, 0)
+        finally:
+            for agent in agents.values():
+                agent.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+# An agent for the tests that plays random moves, but owns a search with
+# worker processes, as the search agents do on machines with several CPUs.
+
+import random
+
+from referee.game import PlayerColor, Action
+from pvs_agent.parallel_pvs_agent import ParallelPVSAgent
+from utils.bitboard import BitBoard
+from utils.placements import PLACEMENT_ACTIONS
+
+NUM_WORKERS = 2
+
+
+class Agent:
+    def __init__(self, color: PlayerColor, **referee: dict):
+        self.board = BitBoard(initial_player=PlayerColor.RED)
+        self.search = ParallelPVSAgent(color, num_workers=NUM_WORKERS)
+
+    def action(self, **referee: dict) -> Action:
+        return PLACEMENT_ACTIONS[random.choice(self.board.get_legal_moves())]
+
+    def update(self, color: PlayerColor, action: Action, **referee: dict):
+        self.board.apply_action(action)
+
+    def close(self):
+        self.search.close()
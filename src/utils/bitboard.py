@@ -0,0 +1,658 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from dataclasses import dataclass
+
+from referee.game.coord import Coord
+from referee.game.player import PlayerColor
+from referee.game.actions import Action, PlaceAction
+from referee.game.constants import *
+
+from utils.board import CellState
+from utils.constants import *
+from utils.placements import *
+from utils.zobrist import *
+from utils.symmetry import canonical_key
+import random
+import numpy as np
+
+# ==============================================================================
+# Bit layout: cell (r, c) is stored at bit index r * BOARD_N + c, so a set of
+# cells on the board is a single python int of NUM_CELLS bits.
+FULL_MASK = (1 << NUM_CELLS) - 1
+_NOT_FIRST_COL = FULL_MASK & ~COL_MASKS[0]
+_NOT_LAST_COL = FULL_MASK & ~COL_MASKS[BOARD_N - 1]
+
+
+def coord_index(coord: Coord) -> int:
+    """
+    Return the bit index of a coordinate.
+    """
+    return coord.r * BOARD_N + coord.c
+
+
+def mask_indices(mask: int) -> list[int]:
+    """
+    Return the bit indices set in a mask, in increasing order.
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+def mask_coords(mask: int) -> set[Coord]:
+    """
+    Return the coordinates of the cells set in a mask.
+    """
+    return set(CELL_COORDS[i] for i in mask_indices(mask))
+
+
+def mask_array(mask: int) -> np.ndarray:
+    """
+    Return a mask as a boolean array of NUM_CELLS cells.
+    """
+    return np.unpackbits(
+        np.frombuffer(mask.to_bytes(16, "little"), dtype=np.uint8),
+        bitorder="little"
+    )[:NUM_CELLS].astype(bool)
+
+
+def adjacent(mask: int) -> int:
+    """
+    Return the cells orthogonally adjacent to any cell of the mask (wrapping
+    around the edges of the toroidal board), excluding the mask itself.
+    """
+    down = ((mask << BOARD_N) | (mask >> (NUM_CELLS - BOARD_N))) & FULL_MASK
+    up = (mask >> BOARD_N) | ((mask << (NUM_CELLS - BOARD_N)) & FULL_MASK)
+    right = ((mask & _NOT_LAST_COL) << 1) \
+        | ((mask & COL_MASKS[BOARD_N - 1]) >> (BOARD_N - 1))
+    left = ((mask & _NOT_FIRST_COL) >> 1) \
+        | ((mask & COL_MASKS[0]) << (BOARD_N - 1))
+    return (down | up | right | left) & ~mask
+
+
+def flood_fill(seed: int, within: int) -> int:
+    """
+    Return the connected region of `within` containing the seed cells.
+    """
+    region = seed & within
+    while True:
+        expanded = region | (adjacent(region) & within)
+        if expanded == region:
+            return region
+        region = expanded
+
+
+@dataclass(frozen=True, slots=True)
+class BitBoardMutation:
+    """
+    A structure representing a change in the state of the bitboard after a
+    move (placement index) has been played. The occupancy masks and Zobrist
+    key prior to the move are kept so that it can be undone in constant time,
+    along with the placements that entered or left the free placement set and
+    each colour's legal placement set, and the empty regions prior to the move.
+    """
+    move: int
+    red: int
+    blue: int
+    zobrist_key: int
+    free_toggled: set[int]
+    legal_toggled: tuple[set[int], set[int]]
+    regions: list[int]
+
+    def __str__(self):
+        return f"BitBoardMutation({PLACEMENT_ACTIONS[self.move]})"
+
+
+class BitBoard:
+    """
+    A bitboard implementation of `utils.board.Board`. The red and blue tokens
+    are each kept as a single NUM_CELLS-bit integer, so that occupancy tests,
+    line clears and flood fills are bit-parallel operations.
+    """
+    def __init__(
+        self,
+        initial_state: dict[Coord, CellState] = {},
+        initial_player: PlayerColor = PlayerColor.RED,
+    ):
+        """
+        Create a new board. It is optionally possible to specify an initial
+        board state (in practice this is only used for testing).
+        """
+        red = 0
+        blue = 0
+        for coord, cell in initial_state.items():
+            if cell.player == PlayerColor.RED:
+                red |= 1 << coord_index(coord)
+            elif cell.player == PlayerColor.BLUE:
+                blue |= 1 << coord_index(coord)
+        self._load(red, blue, initial_player, 0)
+
+    def _load(self, red: int, blue: int, turn_color: PlayerColor, turn_count: int):
+        """
+        Set up the board with the given tokens and turn, computing all the
+        incrementally maintained state from scratch.
+        """
+        self._red = red
+        self._blue = blue
+        self._turn_color: PlayerColor = turn_color
+        self._turn_count = turn_count
+        self._zobrist_key = zobrist_mask(self._red, PlayerColor.RED) \
+            ^ zobrist_mask(self._blue, PlayerColor.BLUE) \
+            ^ zobrist_turn(self._turn_color)
+        # indices of the placements not covering any token, and the legal
+        # placement indices of each colour (indexed by PlayerColor), both kept
+        # up to date by apply_action/undo_action
+        occupied = self._red | self._blue
+        self._free: set[int] = {
+            p for p, mask in enumerate(PLACEMENT_MASKS) if not mask & occupied
+        }
+        self._legal: list[set[int]] = [
+            self._compute_legal_placements(color) for color in PlayerColor
+        ]
+        # the connected regions of empty cells, as disjoint masks. The list is
+        # replaced (never modified) whenever the regions change
+        self._regions: list[int] = self._compute_regions([], self._empty_mask())
+        # game_over and winner_color of the position whose Zobrist key is
+        # _terminal_key, cleared by apply_action/undo_action, and the number of
+        # lookups answered from it or computed
+        self._terminal_key: int | None = None
+        self._terminal: tuple[bool, PlayerColor | None] = (False, None)
+        self.terminal_hits = 0
+        self.terminal_misses = 0
+        # canonical key and symmetry of the position whose Zobrist key is
+        # _canonical_of (see utils.symmetry)
+        self._canonical_of: int | None = None
+        self._canonical: tuple[int, tuple[int, int, int]] | None = None
+
+    def encode(self) -> tuple[int, int, int, int]:
+        """
+        Return a compact encoding of the position, for sending it to another
+        process.
+        """
+        return self._red, self._blue, self._turn_color.value, self._turn_count
+
+    @staticmethod
+    def decode(encoding: tuple[int, int, int, int]) -> "BitBoard":
+        """
+        Return the board of a position encoded by `encode`.
+        """
+        red, blue, turn_color, turn_count = encoding
+        board = BitBoard.__new__(BitBoard)
+        board._load(red, blue, PlayerColor(turn_color), turn_count)
+        return board
+
+    def _compute_regions(self, regions: list[int], pending: int) -> list[int]:
+        """
+        Return `regions` extended with the connected empty regions covering
+        the `pending` empty cells.
+        """
+        regions = list(regions)
+        empty = self._empty_mask()
+        while pending:
+            region = flood_fill(pending & -pending, empty)
+            regions.append(region)
+            pending &= ~region
+        return regions
+
+    def _update_regions(self, piece: int, cleared: int):
+        """
+        Bring the empty regions up to date after `piece` was placed and the
+        `cleared` cells were emptied. Only the regions the piece was placed in
+        or that border a cleared cell are relabelled.
+        """
+        touched = piece | cleared | adjacent(cleared)
+        kept = []
+        pending = cleared
+        for region in self._regions:
+            if region & touched:
+                pending |= region
+            else:
+                kept.append(region)
+        self._regions = self._compute_regions(kept, pending & self._empty_mask())
+
+    def get_legal_actions(self) -> list[PlaceAction]:
+        """
+        Return the legal actions based on current state of board and player
+        """
+        return [PLACEMENT_ACTIONS[p] for p in self.get_legal_moves()]
+
+    def get_legal_moves(self) -> list[int]:
+        """
+        Return the legal moves (placement indices) based on current state of
+        board and player
+        """
+        # first action for each agent
+        if self._turn_count == 0 and self._turn_color == PlayerColor.RED:
+            return list(OPENING_MOVES)
+        elif self._turn_count == 1 and self._turn_color == PlayerColor.BLUE:
+            return self.get_blue_first_moves()
+        # subsequent actions for each agent
+        return list(self._legal_placements(self._turn_color))
+
+    def _legal_placements(self, color: PlayerColor) -> set[int]:
+        """
+        Return the indices of all placements touching a token of the given
+        colour. The returned set is owned by the board and must not be
+        modified.
+        """
+        return self._legal[color]
+
+    def _compute_legal_placements(self, color: PlayerColor) -> set[int]:
+        """
+        Compute the legal placement indices of a colour from scratch.
+        """
+        occupied = self._red | self._blue
+        frontier = adjacent(self._player_mask(color)) & ~occupied
+        candidates = set()
+        for i in mask_indices(frontier):
+            candidates.update(CELL_PLACEMENTS[i])
+        return {p for p in candidates if not PLACEMENT_MASKS[p] & occupied}
+
+    def get_blue_first_action(self):
+        """
+        Return a completely random move starting from a random empty cell.
+        """
+        return [PLACEMENT_ACTIONS[p] for p in self.get_blue_first_moves()]
+
+    def get_blue_first_moves(self) -> list[int]:
+        """
+        Return a completely random move starting from a random empty cell, as
+        a placement index.
+        """
+        empty = self._empty_mask()
+        action_mask = 1 << random.choice(mask_indices(empty))
+        while action_mask.bit_count() < 4:
+            candidates = mask_indices(adjacent(action_mask) & empty)
+            action_mask |= 1 << random.choice(candidates)
+        return [PLACEMENT_INDEX[action_mask]]
+
+    def __getitem__(self, cell: Coord) -> CellState:
+        """
+        Return the state of a cell on the board.
+        """
+        if not self._within_bounds(cell):
+            raise IndexError(f"Cell position '{cell}' is invalid.")
+        bit = 1 << coord_index(cell)
+        if self._red & bit:
+            return CellState(PlayerColor.RED)
+        if self._blue & bit:
+            return CellState(PlayerColor.BLUE)
+        return CellState()
+
+    @property
+    def zobrist_key(self) -> int:
+        """
+        The 64-bit Zobrist key of the position, including the side to move.
+        """
+        return self._zobrist_key
+
+    def canonical_key(self) -> tuple[int, tuple[int, int, int]]:
+        """
+        Return the key of the canonical form of the position under the
+        board's symmetries, and the symmetry mapping the position onto it.
+        """
+        if self._canonical_of != self._zobrist_key:
+            self._canonical = canonical_key(self._red, self._blue, self._turn_color)
+            self._canonical_of = self._zobrist_key
+        return self._canonical
+
+    def apply_action(self, action: Action) -> BitBoardMutation:
+        """
+        Apply an action to a board, mutating the board state.
+        """
+        return self.apply_move(action_placement(action))
+
+    def apply_move(self, move: int) -> BitBoardMutation:
+        """
+        Apply a move (placement index) to a board, mutating the board state.
+        """
+        red, blue, zobrist_key = self._red, self._blue, self._zobrist_key
+        regions = self._regions
+        piece, cleared = self._resolve_placement(move)
+        if cleared:
+            toggled = self._update_legal_placements(
+                (red ^ self._red) | (blue ^ self._blue))
+        else:
+            toggled = self._place_legal_placements(piece, red | blue)
+        self._update_regions(piece, cleared)
+        self._turn_color = self._turn_color.opponent
+        self._turn_count += 1
+        self._terminal_key = None
+        self._zobrist_key ^= ZOBRIST_BLUE_TO_MOVE
+        return BitBoardMutation(move, red, blue, zobrist_key, *toggled, regions)
+
+    def undo_action(self, mutation: BitBoardMutation) -> BitBoardMutation:
+        """
+        Undo the last action played, mutating the board state.
+        """
+        self._turn_color = self._turn_color.opponent
+        self._turn_count -= 1
+        self._terminal_key = None
+        self._red = mutation.red
+        self._blue = mutation.blue
+        self._zobrist_key = mutation.zobrist_key
+        self._free ^= mutation.free_toggled
+        for legal, toggled in zip(self._legal, mutation.legal_toggled):
+            legal ^= toggled
+        self._regions = mutation.regions
+        return mutation
+
+    def _place_legal_placements(self, piece: int, occupied: int):
+        """
+        Bring the free and legal placement sets up to date after the current
+        player placed `piece` on a board with the `occupied` cells, clearing
+        no lines. Placements covering the piece are no longer free, and only
+        the placements covering cells the piece newly borders can become
+        legal for the current player. Return the toggled placements.
+        """
+        covered = set().union(*(CELL_PLACEMENTS[i] for i in mask_indices(piece)))
+        free_toggled = self._free & covered
+        self._free -= free_toggled
+
+        contact = adjacent(self._player_mask(self._turn_color) & ~piece)
+        new_contact = adjacent(piece) & ~contact & ~(occupied | piece)
+        gained = set().union(
+            *(CELL_PLACEMENTS[i] for i in mask_indices(new_contact)))
+        gained &= self._free
+
+        legal_toggled = []
+        for color, legal in zip(PlayerColor, self._legal):
+            toggled = legal & covered
+            if color == self._turn_color:
+                toggled |= gained - legal
+            legal ^= toggled
+            legal_toggled.append(toggled)
+        return free_toggled, tuple(legal_toggled)
+
+    def _update_legal_placements(self, changed: int):
+        """
+        Bring the free and legal placement sets up to date after the cells in
+        the `changed` mask were placed or cleared. Only placements covering or
+        bordering a changed cell are re-tested. Return the toggled placements.
+        """
+        affected = set()
+        for i in mask_indices(changed):
+            affected |= CELL_TOUCHING_PLACEMENTS[i]
+        occupied = self._red | self._blue
+        now_free = {p for p in affected if not PLACEMENT_MASKS[p] & occupied}
+        free_toggled = now_free ^ (self._free & affected)
+        self._free ^= free_toggled
+
+        legal_toggled = []
+        for legal, tokens in zip(self._legal, (self._red, self._blue)):
+            contact = adjacent(tokens)
+            now_legal = {p for p in now_free if PLACEMENT_MASKS[p] & contact}
+            toggled = now_legal ^ (legal & affected)
+            legal ^= toggled
+            legal_toggled.append(toggled)
+        return free_toggled, tuple(legal_toggled)
+
+    def render(self, use_color: bool=False, use_unicode: bool=False) -> str:
+        """
+        Returns a visualisation of the game board as a multiline string, with
+        optional ANSI color codes and Unicode characters (if applicable).
+        """
+        def apply_ansi(str, bold=True, color=None):
+            bold_code = "\033[1m" if bold else ""
+            color_code = ""
+            if color == "r":
+                color_code = "\033[31m"
+            if color == "b":
+                color_code = "\033[34m"
+            return f"{bold_code}{color_code}{str}\033[0m"
+
+        output = ""
+        for i in range(NUM_CELLS):
+            bit = 1 << i
+            if (self._red | self._blue) & bit:
+                color = "r" if self._red & bit else "b"
+                if use_color:
+                    output += apply_ansi(color, color=color, bold=False)
+                else:
+                    output += color
+            else:
+                output += "."
+            output += " "
+            if i % BOARD_N == BOARD_N - 1:
+                output += "\n"
+        return output
+
+    @property
+    def turn_count(self) -> int:
+        """
+        The number of actions that have been played so far.
+        """
+        return self._turn_count
+
+    @property
+    def turn_limit_reached(self) -> bool:
+        """
+        True iff the maximum number of turns has been reached.
+        """
+        return self._turn_count >= MAX_TURNS
+
+    @property
+    def turn_color(self) -> PlayerColor:
+        """
+        The player whose turn it is (represented as a colour).
+        """
+        return self._turn_color
+
+    def modify_turn_color(self, color: PlayerColor = None) -> PlayerColor:
+        if color is None:
+            color = self._turn_color.opponent
+        if color != self._turn_color:
+            self._zobrist_key ^= ZOBRIST_BLUE_TO_MOVE
+        self._turn_color = color
+        return self._turn_color
+
+    def _terminal_status(self) -> tuple[bool, PlayerColor | None]:
+        """
+        Return whether the game is over and the winner, computing both at most
+        once per position.
+        """
+        if self._terminal_key == self._zobrist_key:
+            self.terminal_hits += 1
+            return self._terminal
+        self.terminal_misses += 1
+        game_over = self._compute_game_over()
+        winner = self._compute_winner_color() if game_over else None
+        self._terminal_key = self._zobrist_key
+        self._terminal = (game_over, winner)
+        return self._terminal
+
+    @property
+    def terminal_hit_rate(self) -> float:
+        """
+        The fraction of game_over/winner_color lookups served from the cache.
+        """
+        lookups = self.terminal_hits + self.terminal_misses
+        return self.terminal_hits / lookups if lookups else 0.0
+
+    @property
+    def game_over(self) -> bool:
+        """
+        True iff the game is over.
+        """
+        return self._terminal_status()[0]
+
+    def _compute_game_over(self) -> bool:
+        if self.turn_limit_reached:
+            return True
+        if self._turn_count < 2:
+            return False
+
+        # a piece can be placed iff an empty region of size >= 4 touches one of
+        # the current player's tokens
+        contact = adjacent(self._player_mask(self._turn_color))
+        for region in self._regions:
+            if region & contact and region.bit_count() >= 4:
+                return False
+        return True
+
+    def game_result(self, player_color: PlayerColor):
+        """Returns the utility value of the terminal node."""
+        if self.winner_color == player_color:
+            return WIN
+        elif self.winner_color == player_color.opponent:
+            return LOSS
+        else:
+            return DRAW
+
+    @property
+    def winner_color(self) -> PlayerColor | None:
+        """
+        The player (color) who won the game, or None if no player has won.
+        """
+        return self._terminal_status()[1]
+
+    def _compute_winner_color(self) -> PlayerColor | None:
+        if self.turn_limit_reached:
+            # In this case the player with the most tokens wins, or if equal,
+            # the game ends in a draw.
+            balance = self._red.bit_count() - self._blue.bit_count()
+            if balance == 0:
+                return None
+            return PlayerColor.RED if balance > 0 else PlayerColor.BLUE
+
+        else:
+            # Current player cannot place any more pieces. Opponent wins.
+            return self._turn_color.opponent
+
+    def _within_bounds(self, coord: Coord) -> bool:
+        r, c = coord
+        return 0 <= r < BOARD_N and 0 <= c < BOARD_N
+
+    def _cell_occupied(self, coord: Coord) -> bool:
+        return bool((self._red | self._blue) & (1 << coord_index(coord)))
+
+    def _cell_empty(self, coord: Coord) -> bool:
+        return not (self._red | self._blue) & (1 << coord_index(coord))
+
+    def _player_token_count(self, color: PlayerColor) -> int:
+        return self._player_mask(color).bit_count()
+
+    def _occupied_coords(self) -> set[Coord]:
+        return mask_coords(self._red | self._blue)
+
+    # ==========================================================================
+    # Additional private functions
+    def _player_mask(self, player: PlayerColor) -> int:
+        return self._red if player == PlayerColor.RED else self._blue
+
+    def _empty_mask(self) -> int:
+        return FULL_MASK & ~(self._red | self._blue)
+
+    def _player_occupied_coords(self, player: PlayerColor) -> set[Coord]:
+        return mask_coords(self._player_mask(player))
+
+    def _empty_coords(self) -> set[Coord]:
+        return mask_coords(self._empty_mask())
+    # ==========================================================================
+
+    def _resolve_placement(self, move: int) -> tuple[int, int]:
+        """
+        Add piece to board and remove filled rows and columns. Return the masks
+        of the piece and of the cleared cells.
+        """
+        piece = PLACEMENT_MASKS[move]
+        occupied = self._red | self._blue | piece
+        remove = 0
+        for line in PLACEMENT_LINE_MASKS[move]:
+            if occupied & line == line:
+                remove |= line
+
+        if self._turn_color == PlayerColor.RED:
+            self._red |= piece
+        else:
+            self._blue |= piece
+        self._zobrist_key ^= ZOBRIST_PLACEMENTS[self._turn_color][move]
+        if remove:
+            self._zobrist_key ^= zobrist_mask(self._red & remove, PlayerColor.RED) \
+                ^ zobrist_mask(self._blue & remove, PlayerColor.BLUE)
+            self._red &= ~remove
+            self._blue &= ~remove
+        return piece, remove
+
+    def eval_fn(self, ply: int):
+        """
+        Return a utility value calculated from the persepctive of the player
+        to move.
+        """
+        winner_color = self.winner_color
+        if winner_color is not None:
+            if winner_color == self._turn_color:
+                return 1000 - ply
+            else:
+                return -1000 + ply
+
+        extra_num_actions = self.diff_legal_actions()
+        extra_num_occupied = self.diff_cells_occupied()
+
+        if self._turn_count <= TURN_THRESHOLD:
+            utility = extra_num_actions + extra_num_occupied*0.1
+        else:
+            turns_exceed_threshold = self.turn_count - TURN_THRESHOLD
+            utility = extra_num_actions + extra_num_occupied*turns_exceed_threshold*0.5
+        return utility
+
+    def diff_cells_occupied(self) -> int:
+        """
+        Find the difference in the number of tokens between the player and the
+        opponent.
+        """
+        return self._player_token_count(self._turn_color) \
+            - self._player_token_count(self._turn_color.opponent)
+
+    def diff_legal_actions(self) -> int:
+        """
+        Find the difference in the number of legal actions between the player
+        and the opponent.
+        """
+        return len(self._legal_placements(self._turn_color)) \
+            - len(self._legal_placements(self._turn_color.opponent))
+
+    def diff_reachable_valid_empty_cell(self, player_color: PlayerColor = None) -> int:
+        ''' Find the difference in the number of valid empty cells reachable
+            between the player and the opponent.
+            A cell is valid if it is connected to at least 3 other empty cells.
+        '''
+        player = self._turn_color if player_color is None else player_color
+        return self.num_valid_reachable_cells(player) \
+            - self.num_valid_reachable_cells(player.opponent)
+
+    def empty_connected(self, empty: Coord) -> set[Coord]:
+        ''' Return the empty cells connected to the `empty` cell
+        '''
+        bit = 1 << coord_index(empty)
+        for region in self._regions:
+            if region & bit:
+                return mask_coords(region)
+        return set()
+
+    def num_valid_reachable_cells(self, player: PlayerColor) -> int:
+        reachable = 0
+        contact = adjacent(self._player_mask(player))
+        for region in self._regions:
+            if region & contact:
+                # Only add valid cell count to the output
+                size = region.bit_count()
+                if size >= 4:
+                    reachable += size
+        return reachable
+
+    def diff_row_col_occupied(self, player: PlayerColor=None) -> int:
+        ''' Find the difference in the sum of the number of rows and columns
+            occupied between the player and the opponent.
+        '''
+        if player is None:
+            player = self._turn_color
+        def num_rows_cols(mask: int) -> int:
+            return sum(1 for row in ROW_MASKS if mask & row) \
+                + sum(1 for col in COL_MASKS if mask & col)
+        return num_rows_cols(self._player_mask(player)) \
+            - num_rows_cols(self._player_mask(player.opponent))
@@ -12,6 +12,8 @@ from referee.game.constants import *
 
 from collections import deque
 from utils.constants import *
+from utils.placements import *
+from utils.zobrist import *
 import random
 import numpy as np
 
@@ -75,6 +77,19 @@ class Board:
             self._state = initial_state
         self._turn_color: PlayerColor = initial_player
         self._turn_count = 0
+        self._zobrist_key = zobrist_turn(self._turn_color)
+        self._occupied_mask = 0
+        for coord, cell in self._state.items():
+            self._zobrist_key ^= self._zobrist_cell(coord, cell)
+            if cell.player is not None:
+                self._occupied_mask |= 1 << (coord.r * BOARD_N + coord.c)
+        # game_over and winner_color of the position whose Zobrist key is
+        # _terminal_key, cleared by apply_action/undo_action, and the number of
+        # lookups answered from it or computed
+        self._terminal_key: int | None = None
+        self._terminal: tuple[bool, PlayerColor | None] = (False, None)
+        self.terminal_hits = 0
+        self.terminal_misses = 0
 
     def get_legal_actions(self) -> list[PlaceAction]:
         """
@@ -106,29 +121,15 @@ class Board:
                           adj_coord in visited_coords:
                         continue
                     visited_coords.add(adj_coord)
-                    for piecetype in PieceType:
-                        piece = _TEMPLATES[piecetype]
-                        for rela_coord in piece:
-                            real_piece = []
-                            occupied = False
-                            for target_rela_coord in piece:
-                                if target_rela_coord == rela_coord:
-                                    real_coord = adj_coord
-                                else:
-                                    real_coord = adj_coord.\
-                                    __add__(target_rela_coord).__sub__(rela_coord)
-                                if not self._cell_empty(real_coord):
-                                    occupied = True
-                                    break
-                                real_piece.append(real_coord)
-                            if not occupied:
-                                real_piece.sort()
-                                real_piece = PlaceAction(real_piece[0],
-                                                         real_piece[1], 
-                                                         real_piece[2], 
-                                                         real_piece[3])
-                                legal_actions.add(real_piece)
-        return list(legal_actions)
+                    # only the precomputed placements covering this cell can
+                    # use it as their point of contact
+                    for p in CELL_PLACEMENTS[adj_coord.r * BOARD_N + adj_coord.c]:
+                        if p in legal_actions:
+                            continue
+                        if all(self._state[CELL_COORDS[i]].player is None
+                               for i in PLACEMENT_CELLS[p]):
+                            legal_actions.add(p)
+            return [PLACEMENT_ACTIONS[p] for p in legal_actions]
 
     def get_blue_first_action(self):
         """
@@ -199,6 +200,8 @@ class Board:
         board_mutation = self._resolve_place_action(action)
         self._turn_color = self._turn_color.opponent
         self._turn_count += 1
+        self._terminal_key = None
+        self._zobrist_key ^= ZOBRIST_BLUE_TO_MOVE
         return board_mutation
 
     
@@ -209,9 +212,11 @@ class Board:
         """
         self._turn_color = self._turn_color.opponent
         self._turn_count -= 1
+        self._terminal_key = None
+        self._zobrist_key ^= ZOBRIST_BLUE_TO_MOVE
 
         for cell_mutation in board_mutation.cell_mutations:
-            self._state[cell_mutation.cell] = cell_mutation.prev
+            self._set_cell(cell_mutation.cell, cell_mutation.prev)
 
         return board_mutation
 
@@ -267,18 +272,52 @@ class Board:
         """
         return self._turn_color
 
+    @property
+    def zobrist_key(self) -> int:
+        """
+        The 64-bit Zobrist key of the position, including the side to move.
+        """
+        return self._zobrist_key
+
     def modify_turn_color(self, color: PlayerColor = None) -> PlayerColor:
         if color is None:
-            self._turn_color = self._turn_color.opponent
-        else:
-            self._turn_color = color
+            color = self._turn_color.opponent
+        if color != self._turn_color:
+            self._zobrist_key ^= ZOBRIST_BLUE_TO_MOVE
+        self._turn_color = color
         return self._turn_color
     
+    def _terminal_status(self) -> tuple[bool, PlayerColor | None]:
+        """
+        Return whether the game is over and the winner, computing both at most
+        once per position.
+        """
+        if self._terminal_key == self._zobrist_key:
+            self.terminal_hits += 1
+            return self._terminal
+        self.terminal_misses += 1
+        game_over = self._compute_game_over()
+        winner = self._compute_winner_color() if game_over else None
+        self._terminal_key = self._zobrist_key
+        self._terminal = (game_over, winner)
+        return self._terminal
+
+    @property
+    def terminal_hit_rate(self) -> float:
+        """
+        The fraction of game_over/winner_color lookups served from the cache.
+        """
+        lookups = self.terminal_hits + self.terminal_misses
+        return self.terminal_hits / lookups if lookups else 0.0
+
     @property
     def game_over(self) -> bool:
         """
         True iff the game is over.
         """
+        return self._terminal_status()[0]
+
+    def _compute_game_over(self) -> bool:
         if self.turn_limit_reached:
             return True
         if self._turn_count < 2:
@@ -328,9 +367,9 @@ class Board:
         """
         The player (color) who won the game, or None if no player has won.
         """
-        if not self.game_over:
-            return None
-        
+        return self._terminal_status()[1]
+
+    def _compute_winner_color(self) -> PlayerColor | None:
         if self.turn_limit_reached:
             # In this case the player with the most tokens wins, or if equal,
             # the game ends in a draw.
@@ -388,6 +427,25 @@ class Board:
                 f"Action '{action}' is missing '{attr}' attribute.", 
                     self._turn_color)
         
+    def _set_cell(self, coord: Coord, cell: CellState):
+        """
+        Set the state of a cell, keeping the Zobrist key and the occupancy 
+        mask in sync.
+        """
+        bit = 1 << (coord.r * BOARD_N + coord.c)
+        self._zobrist_key ^= self._zobrist_cell(coord, self._state[coord]) \
+            ^ self._zobrist_cell(coord, cell)
+        if cell.player is None:
+            self._occupied_mask &= ~bit
+        else:
+            self._occupied_mask |= bit
+        self._state[coord] = cell
+
+    def _zobrist_cell(self, coord: Coord, cell: CellState) -> int:
+        if cell.player is None:
+            return 0
+        return ZOBRIST_CELLS[cell.player][coord.r * BOARD_N + coord.c]
+
     def _has_neighbour(self, coord: Coord, color: PlayerColor) -> bool:
         for direction in Direction:
             neighbour = coord + direction
@@ -397,55 +455,34 @@ class Board:
 
     def _resolve_place_action(self, action: PlaceAction):
         """
-        Add piece to board and remove filled rows and columns.
-        """
-        row_nums = set(c.r for c in action.coords)
-        col_nums = set(c.c for c in action.coords)
-        coords_with_piece = self._occupied_coords() | set(action.coords)
-        cell_mutations = dict()
-        remove_coords = set()
+        Add piece to board and remove filled rows and columns. Only the rows 
+        and columns the piece lies on can be completed, and each is tested 
+        with a single mask comparison against the occupancy mask.
+        """
+        placement = action_placement(action)
+        piece = PLACEMENT_MASKS[placement]
+        coords_with_piece = self._occupied_mask | piece
+        remove = 0
+        for line in PLACEMENT_LINE_MASKS[placement]:
+            if coords_with_piece & line == line:
+                remove |= line
 
-        # scan all the coordinates in the same row as the input piece (action)
-        for r in row_nums:
-            remove_r_coords = []
-            filled = True
-            for c in range(BOARD_N):
-                cell = Coord(r, c)
-                if cell not in coords_with_piece:
-                    filled = False
-                    break
-                remove_r_coords.append(cell)
-            if not filled:
-                continue
-            remove_coords.update(remove_r_coords)
-        
-        # scan all the coordinates in the same col as the input piece (action)
-        for c in col_nums:
-            remove_c_coords = []
-            filled = True
-            for r in range(BOARD_N):
-                cell = Coord(r, c)
-                if cell not in coords_with_piece:
-                    filled = False
-                    break
-                remove_c_coords.append(cell)
-            if not filled:
-                continue
-            remove_coords.update(remove_c_coords)
-            
-        for cell in remove_coords:
-            cell_mutations[cell] = CellMutation(cell, self._state[cell], CellState(None))
-            self._state[cell] = CellState(None)
-        
-        for cell in action.coords:
-            if cell not in remove_coords:
-                cell_mutations[cell] = CellMutation(cell, self._state[cell], CellState(self._turn_color))
-                self._state[cell] = CellState(self._turn_color)
-
-        return BoardMutation(
-            action,
-            cell_mutations=set(cell_mutations.values())
-        )
+        cell_mutations = set()
+        removed = remove
+        while removed:
+            low = removed & -removed
+            removed ^= low
+            cell = CELL_COORDS[low.bit_length() - 1]
+            cell_mutations.add(CellMutation(cell, self._state[cell], CellState(None)))
+            self._set_cell(cell, CellState(None))
+
+        for i in PLACEMENT_CELLS[placement]:
+            if not remove >> i & 1:
+                cell = CELL_COORDS[i]
+                cell_mutations.add(CellMutation(cell, self._state[cell], CellState(self._turn_color)))
+                self._set_cell(cell, CellState(self._turn_color))
+
+        return BoardMutation(action, cell_mutations=cell_mutations)
     
     def eval_fn(self, ply: int):
         """
@@ -0,0 +1,92 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pvs_agent.pvs_agent import PVSAgent
+from utils.bitboard import BitBoard
+from utils.constants import *
+from utils.openingbook import write_book
+from utils.orderactions import OrderActions
+from utils.symmetry import *
+
+# ==============================================================================
+# Offline builder of the opening book (see utils.openingbook). Every position
+# reachable in the first few plies is searched, once per canonical form, in a
+# pool of worker processes. Run from the src directory:
+#
+#   python -m utils.bookbuilder [--plies N] [--time SECONDS] [--workers N]
+
+
+def book_moves(board: BitBoard) -> list[int]:
+    """
+    Return the moves of a position considered by the book. Blue's first move
+    may go anywhere, so all of the free placements are considered, rather than
+    the single random one the board offers.
+    """
+    if board.turn_count == 1 and board.turn_color == PlayerColor.BLUE:
+        return sorted(board._free)
+    return board.get_legal_moves()
+
+
+def book_positions(plies: int) -> list[tuple[int, int, int, int]]:
+    """
+    Return the encodings of the canonical forms of all positions reachable in
+    fewer than `plies` plies.
+    """
+    level = {BitBoard().zobrist_key: BitBoard().encode()}
+    positions = []
+    for _ in range(plies):
+        positions.extend(level.values())
+        next_level = {}
+        for encoding in level.values():
+            board = BitBoard.decode(encoding)
+            for move in book_moves(board):
+                mutation = board.apply_move(move)
+                key, _ = board.canonical_key()
+                if key not in next_level and not board.game_over:
+                    red, blue, _ = canonical_form(board._red, board._blue)
+                    next_level[key] = (red, blue, board.turn_color.value, board.turn_count)
+                board.undo_action(mutation)
+        level = next_level
+    return positions
+
+
+def _search_position(encoding: tuple[int, int, int, int], seconds: float) -> tuple[int, int]:
+    """
+    Search a position in its canonical form, and return its key and best move.
+    """
+    board = BitBoard.decode(encoding)
+    agent = PVSAgent(board.turn_color)
+    moves = OrderActions.order_actions(board, book_moves(board), agent.transposition_table, {})
+    moves = OrderActions.topk_actions(moves)
+    results, _ = agent.root_split_search(board, moves, time.time() + seconds)
+    _, move = results[max(results)]
+    return board.zobrist_key, move
+
+
+def build_book(path: str = OPENING_BOOK_PATH, plies: int = BOOK_PLIES,
+               seconds: float = BOOK_SEARCH_TIME, workers: int = os.cpu_count()):
+    """
+    Search every position of the first `plies` plies and write the book.
+    """
+    positions = book_positions(plies)
+    print(f"searching {len(positions)} positions with {workers} workers")
+    with ProcessPoolExecutor(workers) as executor:
+        entries = dict(executor.map(
+            _search_position, positions, [seconds] * len(positions)))
+    write_book(path, entries)
+    print(f"wrote {len(entries)} entries to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book.")
+    parser.add_argument("--path", default=OPENING_BOOK_PATH)
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--time", type=float, default=BOOK_SEARCH_TIME)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    build_book(args.path, args.plies, args.time, args.workers)
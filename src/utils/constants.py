@@ -1,6 +1,7 @@
 from referee.game.constants import MAX_TURNS
 from referee.game.constants import BOARD_N
 import numpy as np
+import os
 DELIM_LEN = 25
 
 TURN_THRESHOLD = MAX_TURNS * 0.8 
@@ -33,6 +34,74 @@ SAFE_RANDOM_TIME_OUT = 0.5
 
 # ============================== space allocation ==============================
 MAX_TABLE_SIZE = 300
+# the transposition table holds 2 * 2**TT_SIZE_LOG2 entries of 24 bytes each
+TT_SIZE_LOG2 = 18
+# key the transposition and state info tables on the canonical form of each
+# position under the board's symmetries (see utils.symmetry)
+SYMMETRIC_TABLES = False
+
+# ================================= opening book ================================
+# the book built by `python -m utils.bookbuilder`, number of opening plies it
+# covers, and seconds of search spent on each position when building it
+OPENING_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openingbook.bin")
+BOOK_PLIES = 2
+BOOK_SEARCH_TIME = 20
+
+# ================================ endgame solver ===============================
+# the game is solved exactly once at most this many cells are empty, taking up
+# to this share of the move's time before falling back to the heuristic
+# search, and the solver's table is trimmed to proven entries beyond this size
+ENDGAME_EMPTY_CELLS = 24
+ENDGAME_TIME_SHARE = 0.5
+ENDGAME_TABLE_SIZE = 500000
+# epsilon of the 1 + epsilon trick in the endgame proof-number search
+ENDGAME_EPSILON = 0.25
+
+# ============================== search statistics =============================
+# file the search agents append their search statistics to as a line of JSON
+# per move ("-" for stdout, None to not collect them; see utils.searchstats)
+SEARCH_STATS_FILE = os.environ.get("TETRESS_SEARCH_STATS")
+
+# =============================== parallel search ==============================
+# number of worker processes of the parallel searches (root splitting and Lazy
+# SMP), leaving one core for the referee (0 to search in the agent process only)
+SEARCH_WORKERS = max(0, min(4, (os.cpu_count() or 1) - 1))
+# CPU seconds the workers may use in total over a game. The referee's
+# CountdownTimer only charges the agent process, so the workers get a separate
+# budget, by default the same as the referee's time limit
+WORKER_TIME_BUDGET = 180
+# maximum random noise added to move ordering scores by Lazy SMP helpers, so
+# that they search the tree in a different order from the main search
+HELPER_ORDER_NOISE = 1.0
+
+# ================================ mcts rollouts ================================
+# number of random placements tried for a rollout move before a piece is grown
+# cell by cell instead, and number of moves sampled per turn by the rollout
+# heuristic
+# (1 for uniformly random rollouts)
+ROLLOUT_TRIES = 2
+ROLLOUT_CANDIDATES = 1
+
+# ================================ parallel mcts ================================
+# "root" for an independent tree per worker merged by root visit counts with
+# the agent's own tree, or "leaf" for a single tree whose playouts are run by
+# the workers in batches
+MCTS_PARALLEL_MODE = "root"
+# number of leaves selected per batch of playouts in leaf parallelism
+MCTS_BATCH_SIZE = 32
+# visits (counted as losses) added to the nodes of a path while its playout is
+# pending, so that the other selections of a batch spread over the tree
+VIRTUAL_LOSS = 1
+
+# ================================ mcts memory =================================
+# maximum number of nodes in the tree, and share of the referee's remaining
+# space it may take, at an estimated MCTS_NODE_BYTES per node (mostly the
+# python lists of children and untried moves)
+MCTS_MAX_NODES = 200000
+MCTS_SPACE_FRACTION = 0.5
+MCTS_NODE_BYTES = 512
+# share of the maximum number of nodes kept when pruning a full tree
+MCTS_PRUNE_KEEP = 0.5
 
 # ============= game phase based on the number of empty cells ==================
 # MIDGAME_STAGE = NUM_CELLS * 0.6
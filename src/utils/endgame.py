@@ -0,0 +1,207 @@
+import time
+
+from referee.game import PlayerColor
+from utils.bitboard import *
+from utils.constants import *
+
+# proof and disproof numbers at or above this count as infinite
+_INFINITY = 10**9
+# goals of the player to move at the root: winning, or at least drawing
+_WIN_GOAL = 0
+_DRAW_GOAL = 1
+# outcome of a finished game without a winner
+_NO_WINNER = -1
+
+
+def _legal_moves(player: int, occupied: int) -> set[int]:
+    """
+    Return the placements touching the `player` tokens and not covering any
+    of the `occupied` cells.
+    """
+    moves = set()
+    for cell in mask_indices(adjacent(player) & ~occupied):
+        for move in CELL_PLACEMENTS[cell]:
+            if not PLACEMENT_MASKS[move] & occupied:
+                moves.add(move)
+    return moves
+
+
+def _play(state: tuple[int, int, int, int], move: int) -> tuple[int, int, int, int]:
+    """
+    Return the state after a move, states being (red, blue, color to move,
+    turn count) tuples as given by `BitBoard.encode`.
+    """
+    red, blue, color, turn_count = state
+    piece = PLACEMENT_MASKS[move]
+    occupied = red | blue | piece
+    if color == PlayerColor.RED.value:
+        red |= piece
+    else:
+        blue |= piece
+    remove = 0
+    for line in PLACEMENT_LINE_MASKS[move]:
+        if occupied & line == line:
+            remove |= line
+    return red & ~remove, blue & ~remove, 1 - color, turn_count + 1
+
+
+# ______________________________________________________________________________
+class EndgameSolver:
+    """
+    An exact endgame solver using depth-first proof-number search (df-pn).
+    A search proves or disproves a goal of the player to move at the root:
+    first a win, and if that fails, at least a draw. Positions are searched as
+    plain (red, blue, color, turn count) states rather than on a `BitBoard`,
+    whose incremental bookkeeping costs more than it saves on a nearly full
+    board, and finished games are judged by the same rules as
+    `BitBoard.winner_color`: a player unable to move loses, and at MAX_TURNS
+    the player with more tokens wins.
+
+    Each node stores its (phi, delta) numbers: phi is the proof number for
+    the player to move there and delta the disproof number. The turn count is
+    part of the state, as positions with the same tokens can have different
+    results near the turn limit, so the positions form a DAG without cycles.
+    The table is kept across moves, as the numbers stay valid, and once it
+    holds more than `max_entries` entries only proven and disproven ones are
+    kept.
+    """
+    def __init__(self, max_entries=ENDGAME_TABLE_SIZE):
+        self.table: dict[tuple, tuple[int, int]] = {}
+        self.max_entries = max_entries
+        self.expire_time = None
+        self.timed_out = False
+        self.nodes = 0
+        # the player to move at the root, as a PlayerColor value
+        self.player = None
+
+    def solve(self, board: BitBoard, expire_time=None) -> tuple[int, int] | None:
+        """
+        Return the result (WIN, DRAW or LOSS) of a position for the player to
+        move with perfect play, and a move achieving it. Return None if the
+        position could not be solved before the time limit expires.
+        """
+        self.expire_time = expire_time
+        self.timed_out = False
+        if len(self.table) > self.max_entries:
+            self.table = {
+                key: numbers for key, numbers in self.table.items() if 0 in numbers
+            }
+
+        state = board.encode()
+        self.player = state[2]
+        for goal, result in ((_WIN_GOAL, WIN), (_DRAW_GOAL, DRAW)):
+            phi, _ = self._mid(state, goal, _INFINITY, _INFINITY)
+            if self.timed_out:
+                return None
+            if phi == 0:
+                return result, self._proving_move(state, goal)
+        # every move loses
+        return LOSS, board.get_legal_moves()[0]
+
+    def best_move(self, board: BitBoard, expire_time=None) -> int | None:
+        """
+        Return a move of the player to move that wins, or else draws, with
+        perfect play. Return None if the position is lost, or could not be
+        solved in time, so that it is left to the heuristic search.
+        """
+        solution = self.solve(board, expire_time)
+        if solution is None or solution[0] == LOSS:
+            return None
+        return solution[1]
+
+    def _terminal_numbers(self, state: tuple[int, int, int, int], winner: int, goal: int) -> tuple[int, int]:
+        """
+        Return the (phi, delta) numbers of a finished game with the given
+        winner.
+        """
+        if goal == _WIN_GOAL:
+            achieved = winner == self.player
+        else:
+            achieved = winner != 1 - self.player
+        # the goal is the root player's, and its opposite the opponent's
+        if achieved == (state[2] == self.player):
+            return 0, _INFINITY
+        return _INFINITY, 0
+
+    def _children(self, state: tuple[int, int, int, int], moves: set[int], goal: int) -> list[list]:
+        """
+        Return the move, state and current (phi, delta) numbers of each child
+        of a position reached by the given moves.
+        """
+        children = []
+        for move in moves:
+            child = _play(state, move)
+            children.append([move, child, self.table.get((child, goal), (1, 1))])
+        return children
+
+    def _mid(self, state: tuple[int, int, int, int], goal: int, phi_threshold: int, delta_threshold: int) -> tuple[int, int]:
+        """
+        Expand a position until its phi or delta number reaches its
+        threshold, and return its (phi, delta) numbers.
+        """
+        self.nodes += 1
+        key = (state, goal)
+        phi, delta = self.table.get(key, (1, 1))
+        if phi >= phi_threshold or delta >= delta_threshold:
+            return phi, delta
+        if self.expire_time is not None and self.nodes % 256 == 0 \
+                and time.time() > self.expire_time:
+            self.timed_out = True
+        if self.timed_out:
+            return phi, delta
+
+        red, blue, color, turn_count = state
+        moves = None
+        if turn_count >= MAX_TURNS:
+            # the player with the most tokens wins, or if equal, it's a draw
+            balance = red.bit_count() - blue.bit_count()
+            winner = _NO_WINNER if balance == 0 else \
+                PlayerColor.RED.value if balance > 0 else PlayerColor.BLUE.value
+        else:
+            # the tokens of the player to move, as colour values index states
+            moves = _legal_moves(state[color], red | blue)
+            # a player who cannot place a piece loses
+            winner = 1 - color
+        if not moves:
+            self.table[key] = self._terminal_numbers(state, winner, goal)
+            return self.table[key]
+
+        children = self._children(state, moves, goal)
+        while True:
+            # the player to move needs one child that the opponent fails in,
+            # and fails if the opponent succeeds in every child
+            phi = min(numbers[1] for _, _, numbers in children)
+            delta = min(_INFINITY, sum(numbers[0] for _, _, numbers in children))
+            if phi >= phi_threshold or delta >= delta_threshold or self.timed_out:
+                break
+
+            # expand the most promising child until it is no longer so
+            best = second = None
+            for child in children:
+                if best is None or child[2][1] < best[2][1]:
+                    best, second = child, best
+                elif second is None or child[2][1] < second[2][1]:
+                    second = child
+            child_phi = best[2][0]
+            second_delta = second[2][1] if second is not None else _INFINITY
+            # the 1 + epsilon trick: stay in the child a little longer than
+            # plain df-pn would, to cut down on re-expansions
+            best[2] = self._mid(
+                best[1], goal,
+                min(_INFINITY, delta_threshold - delta + child_phi),
+                min(phi_threshold, int(second_delta * (1 + ENDGAME_EPSILON)) + 1))
+
+        self.table[key] = (phi, delta)
+        return phi, delta
+
+    def _proving_move(self, state: tuple[int, int, int, int], goal: int) -> int:
+        """
+        Return a move of a proven position leading to a child the opponent
+        fails in.
+        """
+        red, blue, color, _ = state
+        moves = _legal_moves(state[color], red | blue)
+        for move, _, (_, delta) in self._children(state, moves, goal):
+            if delta == 0:
+                return move
+        raise ValueError("the position is not proven")
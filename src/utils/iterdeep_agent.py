@@ -10,6 +10,9 @@ import numpy as np
 from utils.orderactions import *
 from utils.ttable import *
 from utils.stable import *
+from utils.openingbook import OpeningBook
+from utils.endgame import EndgameSolver
+from utils.searchstats import SearchStats
 
 
 class IterativeDeepeningAgent(ABC):
@@ -20,19 +23,31 @@ class IterativeDeepeningAgent(ABC):
         self.color = color # color of THE PLAYER (YOU)
         self.full_depth = True
         self.expire_time = None
+        # random noise added to the move ordering scores, and a shared flag to
+        # end the search early (both used by Lazy SMP helpers, see LazySMP)
+        self.order_noise = 0
+        self.stop_flag = None
+        self.opening_book = OpeningBook()
+        self.endgame_solver = EndgameSolver()
+        # statistics of the search of each move, if they are collected
+        self.stats = SearchStats() if SEARCH_STATS_FILE else None
 
     def best_action(self, board: Board, time_remaining):
         """
-        Return the best action node. Different strategy is employed at different
-        stage of the game.
+        Return the best move (placement index). Different strategy is employed 
+        at different stage of the game.
         """
         # print("@ number of legal actions:", root.num_player_legal_actions)
         # print("@ number of empty coordinates:", root.num_empty_cells)
-        legal_actions = board.get_legal_actions()
+        legal_actions = board.get_legal_moves()
         # game_progress = len(legal_actions)
         game_progress = len(board._empty_coords())
         
-        if board._turn_count == 0 or game_progress > EMPTY_THRESHOLD:
+        book_move = self.opening_book.lookup(board)
+        if book_move is not None:
+            # play the move searched offline
+            best_action = book_move
+        elif board._turn_count == 0 or game_progress > EMPTY_THRESHOLD:
             # play a safe random move
             # print("%"*DELIM_LEN, "OPENING_GAME_STAGE", "%"*DELIM_LEN)
             best_action = random.choice(legal_actions)
@@ -42,17 +57,27 @@ class IterativeDeepeningAgent(ABC):
             start_time = time.time()
             expire_time = start_time + time_remaining/(MAX_TURNS - board._turn_count) + board._turn_count/TIME_OUT_FACTOR
             # print("allocated time:", expire_time - start_time)
-            best_action = self.iterative_deepening_search(board, MAX_SEARCH_DEPTH, expire_time=expire_time)
+            best_action = None
+            if game_progress <= ENDGAME_EMPTY_CELLS:
+                # try to solve the game exactly, leaving lost or unsolved
+                # positions to the heuristic search
+                best_action = self.endgame_solver.best_move(
+                    board, start_time + (expire_time - start_time)*ENDGAME_TIME_SHARE)
+            if best_action is None:
+                best_action = self.iterative_deepening_search(board, MAX_SEARCH_DEPTH, expire_time=expire_time)
                
         return best_action
     
     def iterative_deepening_search(self, board: Board, max_depth=MAX_SEARCH_DEPTH, expire_time=None):
         """
-        Return the best action in a iterative deepening scheme. Search until the 
+        Return the best move in a iterative deepening scheme. Search until the 
         time limit expires.
         """
         depth = 1
         self.expire_time = expire_time
+        self.transposition_table.new_search()
+        if self.stats is not None:
+            self.stats.reset()
         move_values = {}
         while depth < max_depth:
             # print("max depth:", depth)
@@ -60,10 +85,13 @@ class IterativeDeepeningAgent(ABC):
             # print("move_values:")
             # print(move_values)
             _, best_action, exit_type = self.search(board, -np.inf, np.inf, depth, 0, move_values)
+            if self.stats is not None:
+                self.stats.end_depth(depth)
             depth += 1
             if exit_type == SearchExit.TIME or exit_type == SearchExit.FULL_DEPTH:
                 break
         self.full_depth = True
+        self.dump_stats(board)
         return best_action
     
     @abstractmethod
@@ -74,7 +102,19 @@ class IterativeDeepeningAgent(ABC):
         """
         return NotImplementedError
 
+    def dump_stats(self, board: Board):
+        """
+        Write out the statistics of the search of a move, if they are
+        collected.
+        """
+        if self.stats is not None:
+            self.stats.dump(
+                SEARCH_STATS_FILE, agent=type(self).__name__,
+                color=self.color.name, turn=board.turn_count)
+
     def has_time_left(self):
+        if self.stop_flag is not None and self.stop_flag.value:
+            return False
         return time.time() < self.expire_time
     
     def cutoff_test(self, board: Board, depth):
@@ -84,26 +124,31 @@ class IterativeDeepeningAgent(ABC):
         """
         Return the best value, best action of the current node. Agent specific.
         """
-        entry: TTEntry = self.transposition_table.retrieve(board._state)
+        stats = self.stats
+        entry: TTEntry = self.transposition_table.retrieve(board)
+        if stats is not None:
+            stats.nodes += 1
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
         if entry is not None and entry.depth >= depth:
             # print("-------------------------visited-------------------------")
             if entry.node_type == EXACT:
-                return entry.best_value, entry.best_action, SearchExit.DEPTH
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return entry.best_value, entry.best_move, SearchExit.DEPTH
             elif entry.node_type == LOWER_BOUND and entry.best_value > alpha:
                 alpha = entry.best_value
             elif entry.node_type == UPPER_BOUND and entry.best_value < beta:
                 beta = entry.best_value
             if alpha >= beta:
-                return entry.best_value, entry.best_action, SearchExit.DEPTH
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return entry.best_value, entry.best_move, SearchExit.DEPTH
         
         if self.cutoff_test(board, depth):
             utility_value = board.eval_fn(ply)
-
-            print(board.render(use_color=True))
-            print("agent's color:", self.color)
-            print("turn color:", board.turn_color)
-            print("ply:", ply)
-            print("utility_value:", utility_value)
+            if stats is not None:
+                stats.leaves += 1
 
             if utility_value <= alpha:
                 self.transposition_table.store(board, LOWER_BOUND, depth, None, utility_value)
@@ -125,12 +170,14 @@ class IterativeDeepeningAgent(ABC):
         best_action = None
         value = -np.inf
 
-        actions = self.stateinfo_table.retrieve(board, depth, self.transposition_table, move_values)[board._turn_color]
+        actions = self.stateinfo_table.retrieve(board, depth, self.transposition_table, move_values, self.order_noise)[board._turn_color]
 
         # print("depth:", ply, "total number of actions", len((actions)))
+        if stats is not None:
+            stats.expand(ply, len(actions))
 
-        for action in actions:
-            mutation = board.apply_action(action)
+        for index, action in enumerate(actions):
+            mutation = board.apply_move(action)
             action_value, _, search_exit_type = self.alpha_beta_with_memory(board, -beta, -alpha, depth - 1, ply + 1, move_values)
             action_value = -action_value
             if action_value > value:
@@ -139,9 +186,9 @@ class IterativeDeepeningAgent(ABC):
             alpha = max(alpha, value)
             board.undo_action(mutation)
             if alpha >= beta:
-                print("----------------- prunned", len(actions)-actions.index(action)-1, "nodes")
+                if stats is not None:
+                    stats.cutoff(index)
                 break   
-            print("action:", action, "action_value:", action_value)
 
             if self.has_time_left() == False:
                 search_exit_type = SearchExit.TIME
@@ -152,8 +199,7 @@ class IterativeDeepeningAgent(ABC):
             node_type = LOWER_BOUND
         elif value >= beta:
             node_type = UPPER_BOUND
-        print("best_action:", best_action, "best_value:", value)
-        move_values[board._state.__hash__()] = value
+        move_values[board.zobrist_key] = value
         self.transposition_table.store(board, node_type, depth, best_action, value)
         return value, best_action, search_exit_type
 
@@ -0,0 +1,132 @@
+import multiprocessing
+import sys
+import time
+import weakref
+
+from utils.bitboard import BitBoard
+from utils.iterdeep_agent import *
+
+# ______________________________________________________________________________
+def _lazy_smp_helper(agent, index: int, conn, agent_conns):
+    """
+    Entry point of a Lazy SMP helper process, running on a forked copy of the
+    main agent. For each task sent over `conn` the helper searches the same
+    root as the main agent with a perturbed move ordering, and replies with
+    the CPU time spent.
+    """
+    # close the agent's ends of the pipes, inherited on fork, so that the
+    # helper sees EOF once the agent process has gone
+    for agent_conn in agent_conns:
+        agent_conn.close()
+    np.random.seed(index)
+    agent.helpers = []
+    agent.order_noise = HELPER_ORDER_NOISE
+    # only the agent's own search reports statistics
+    agent.stats = None
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            # the agent process has exited
+            return
+        if task is None:
+            return
+        encoding, max_depth, expire_time, generation = task
+        start = time.process_time()
+        agent.transposition_table.generation = generation
+        super(LazySMP, agent).iterative_deepening_search(
+            BitBoard.decode(encoding), max_depth, expire_time=expire_time)
+        conn.send(time.process_time() - start)
+
+
+def _stop_helpers(helpers: list, transposition_table: TranspositionTable):
+    """
+    Stop helper processes, given as (process, connection) pairs, and release
+    the shared transposition table.
+    """
+    for process, conn in helpers:
+        try:
+            conn.send(None)
+        except OSError:
+            # the helper has already exited
+            pass
+        conn.close()
+        process.join()
+    helpers.clear()
+    transposition_table.close()
+
+
+class LazySMP:
+    """
+    Mixin adding Lazy SMP to an `IterativeDeepeningAgent`, e.g.
+    `class LazySMPPVSAgent(LazySMP, PVSAgent)`. The transposition table is
+    moved to shared memory and helper processes, forked once at construction,
+    search the same root as the agent with noisy move ordering. They only
+    communicate through the table, where their results speed up the agent's
+    own search. As with `ParallelPVSAgent`, the helpers' CPU time is charged
+    against a separate budget, and the helpers are stopped by `close`, or
+    else when the agent is collected or its process exits.
+    """
+    def __init__(self, color: PlayerColor, num_helpers=SEARCH_WORKERS, worker_time_budget=WORKER_TIME_BUDGET):
+        super().__init__(color)
+        self.worker_time_left = worker_time_budget
+        self.helpers = []
+        if num_helpers == 0:
+            return
+
+        self.transposition_table = TranspositionTable(shared=True)
+        self.stop_flag = multiprocessing.RawValue("b", 0)
+        # the referee replaces stdin by an object that multiprocessing cannot
+        # close in the child, and the helpers never read it anyway
+        stdin, sys.stdin = sys.stdin, None
+        try:
+            for index in range(1, num_helpers + 1):
+                conn, helper_conn = multiprocessing.Pipe()
+                agent_conns = [c for _, c in self.helpers] + [conn]
+                process = multiprocessing.Process(
+                    target=_lazy_smp_helper,
+                    args=(self, index, helper_conn, agent_conns), daemon=True)
+                process.start()
+                helper_conn.close()
+                self.helpers.append((process, conn))
+        finally:
+            sys.stdin = stdin
+        self._finalizer = weakref.finalize(
+            self, _stop_helpers, self.helpers, self.transposition_table)
+
+    def close(self):
+        """
+        Stop the helper processes and release the shared transposition table.
+        The agent must not search afterwards.
+        """
+        if self.helpers:
+            self._finalizer()
+
+    def iterative_deepening_search(self, board: BitBoard, max_depth=MAX_SEARCH_DEPTH, expire_time=None):
+        """
+        Return the best move of the agent's own search, run alongside the
+        helpers' searches of the same root.
+        """
+        if not self.helpers or self.worker_time_left <= 0:
+            # the stop flag of the last parallel search must not cut this one
+            # short (see has_time_left)
+            assert not self.helpers or not self.stop_flag.value
+            return super().iterative_deepening_search(board, max_depth, expire_time)
+
+        helper_expire_time = min(
+            expire_time, time.time() + self.worker_time_left/len(self.helpers))
+        task = (board.encode(), max_depth, helper_expire_time,
+                self.transposition_table.generation)
+        self.stop_flag.value = 0
+        for _, conn in self.helpers:
+            conn.send(task)
+
+        best_move = super().iterative_deepening_search(board, max_depth, expire_time)
+
+        # the search is over, so stop any helper still searching
+        self.stop_flag.value = 1
+        for _, conn in self.helpers:
+            self.worker_time_left -= conn.recv()
+        # and clear the flag, which the agent's own search also reads
+        self.stop_flag.value = 0
+        return best_move
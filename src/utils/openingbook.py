@@ -0,0 +1,66 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+import os
+import numpy as np
+
+from utils.bitboard import BitBoard
+from utils.constants import *
+from utils.symmetry import *
+
+# ==============================================================================
+# An opening book file maps the canonical keys of opening positions to the best
+# move found for each by an offline search (see utils.bookbuilder), as a move
+# of the canonical form. The file holds the number of entries n (8 bytes), the
+# n keys in increasing order (8 bytes each) and then the n moves (2 bytes
+# each), all little-endian.
+_COUNT = np.dtype("<u8")
+_KEY = np.dtype("<u8")
+_MOVE = np.dtype("<u2")
+
+
+def write_book(path: str, entries: dict[int, int]):
+    """
+    Write a book file of canonical keys and moves.
+    """
+    keys = np.array(sorted(entries), dtype=_KEY)
+    moves = np.array([entries[key] for key in keys.tolist()], dtype=_MOVE)
+    with open(path, "wb") as file:
+        file.write(np.array([len(keys)], dtype=_COUNT).tobytes())
+        file.write(keys.tobytes())
+        file.write(moves.tobytes())
+
+
+class OpeningBook:
+    """
+    A read-only opening book. The file is memory-mapped rather than read, so
+    opening it costs next to nothing, and each lookup is a binary search over
+    the keys that only touches the pages it needs. A missing file gives an
+    empty book.
+    """
+    def __init__(self, path: str = OPENING_BOOK_PATH):
+        self.keys = np.empty(0, dtype=_KEY)
+        self.moves = np.empty(0, dtype=_MOVE)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        n = int(np.memmap(path, dtype=_COUNT, mode="r", shape=(1,))[0])
+        if n:
+            self.keys = np.memmap(path, dtype=_KEY, mode="r", offset=_COUNT.itemsize, shape=(n,))
+            self.moves = np.memmap(
+                path, dtype=_MOVE, mode="r", offset=_COUNT.itemsize + n*_KEY.itemsize, shape=(n,))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, board: BitBoard) -> int | None:
+        """
+        Return the book move (placement index) of a position, or None if the
+        position is not in the book.
+        """
+        if not len(self.keys):
+            return None
+        key, symmetry = board.canonical_key()
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i == len(self.keys) or int(self.keys[i]) != key:
+            return None
+        return inverse_transform_move(int(self.moves[i]), symmetry)
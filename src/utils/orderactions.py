@@ -1,38 +1,52 @@
 from utils.node import *
 from utils.ttable import *
+from utils.bitboard import *
+
+def _grid(cells: np.ndarray) -> np.ndarray:
+    """
+    View an (n, NUM_CELLS) array of boards as an (n, BOARD_N, BOARD_N) array.
+    """
+    return cells.reshape(len(cells), BOARD_N, BOARD_N)
+
+def _adjacent_cells(cells: np.ndarray) -> np.ndarray:
+    """
+    Return the cells orthogonally adjacent to each board of an (n, NUM_CELLS)
+    boolean array, wrapping around the edges of the toroidal board.
+    """
+    grid = _grid(cells)
+    adjacent = np.roll(grid, 1, axis=1) | np.roll(grid, -1, axis=1) \
+        | np.roll(grid, 1, axis=2) | np.roll(grid, -1, axis=2)
+    return adjacent.reshape(cells.shape)
 
 class OrderActions:
     @staticmethod
-    def order_actions(board: Board, actions: list, ttable: TranspositionTable, move_values):
-        """
-        Return a sorted list of actions based on best value stored in 
-        transposition table, best value from previous iteration and heuristic 
-        value.
-        """
-        move_scores = {}
-        ordered_actions = []
-
-        for action in actions:
-            mutation = board.apply_action(action)
-            if board._state in move_values:
-                move_scores[board._state.__hash__()] = -move_values[board._state.__hash__()]
-            else:
-                ttentry: TTEntry = ttable.retrieve(board._state)
-                if ttentry is not None:
-                    move_scores[board._state.__hash__()] = -ttentry.best_value
-                else:
-                    move_scores[board._state.__hash__()] = OrderActions.heuristic_evaluate_action(action, board)
-            board.undo_action(mutation)
-
-        def get_move_score(action: PlaceAction):
-            mutation = board.apply_action(action)
-            value = move_scores[board._state.__hash__()]
-            board.undo_action(mutation)
-            return value
-
-        ordered_actions = sorted(actions, key=get_move_score, reverse=True)
-        return ordered_actions
-    
+    def order_actions(board: BitBoard, moves: list[int], ttable: TranspositionTable, move_values, noise=0):
+        """
+        Return a sorted list of moves (placement indices) based on best value
+        stored in transposition table, best value from previous iteration and
+        heuristic value. All the children are scored at once over NumPy arrays
+        instead of being played on the board one by one. If `noise` is given,
+        a uniform random amount up to it is added to each score.
+        """
+        if not moves:
+            return []
+        movers, opponents, keys = OrderActions.batch_apply_moves(board, np.array(moves))
+
+        scores = -ttable.retrieve_values(keys)
+        for i, key in enumerate(keys.tolist()):
+            if key in move_values:
+                scores[i] = -move_values[key]
+        missing = np.isnan(scores)
+        if missing.any():
+            scores[missing] = OrderActions.batch_heuristic_evaluate(
+                board, movers[missing], opponents[missing])
+
+        if noise:
+            scores += np.random.uniform(0, noise, len(scores))
+        # stable, so that moves of equal score keep their order
+        order = np.argsort(-scores, kind="stable")
+        return [moves[i] for i in order]
+
     @staticmethod
     def topk_actions(actions):
         """
@@ -42,12 +56,99 @@ class OrderActions:
         return actions[:k]
 
     @staticmethod
-    def heuristic_evaluate_action(action: PlaceAction, board: Board):
+    def batch_apply_moves(board: BitBoard, moves: np.ndarray):
+        """
+        Return the tokens of the player to move and of the opponent, as
+        (len(moves), NUM_CELLS) boolean arrays, and the Zobrist keys of the
+        positions after each of the moves, without mutating the board.
+        """
+        color = board._turn_color
+        player = mask_array(board._player_mask(color))
+        opponent = mask_array(board._player_mask(color.opponent))
+        pieces = PLACEMENT_CELL_ARRAY[moves]
+
+        # a line is completed iff the piece fills all of its empty cells
+        line_counts = LINE_CELL_ARRAY.astype(np.int8) @ (player | opponent)
+        full = line_counts + PLACEMENT_LINE_COUNTS[moves] == BOARD_N
+        cleared = full @ LINE_CELL_ARRAY
+
+        movers = (player | pieces) & ~cleared
+        opponents = opponent & ~cleared
+        keys = np.uint64(board.zobrist_key ^ ZOBRIST_BLUE_TO_MOVE) \
+            ^ ZOBRIST_PLACEMENT_ARRAY[color][moves]
+        clearing = full.any(axis=1)
+        if clearing.any():
+            cleared_keys = np.where(
+                cleared[clearing] & (player | pieces[clearing]),
+                ZOBRIST_CELL_ARRAY[color], np.uint64(0)
+            ) ^ np.where(
+                cleared[clearing] & opponent,
+                ZOBRIST_CELL_ARRAY[color.opponent], np.uint64(0)
+            )
+            keys[clearing] ^= np.bitwise_xor.reduce(cleared_keys, axis=1)
+        return movers, opponents, keys
+
+    @staticmethod
+    def batch_heuristic_evaluate(board: BitBoard, movers: np.ndarray, opponents: np.ndarray) -> np.ndarray:
+        """
+        Return the heuristic value of each child given by the tokens of the
+        player who moved and of the opponent, from the perspective of the
+        player who moved. This is the batched form of
+        `heuristic_evaluate_action`.
+        """
+        empty = ~(movers | opponents)
+        mover_reachable, opponent_reachable = \
+            OrderActions.batch_num_valid_reachable_cells(empty, [movers, opponents])
+        diff_cells_occupied = movers.sum(axis=1) - opponents.sum(axis=1)
+        diff_reachable = mover_reachable - opponent_reachable
+        if board._turn_count + 1 < 20:
+            return diff_cells_occupied + diff_reachable
+        return diff_cells_occupied*0.5 + diff_reachable
+
+    @staticmethod
+    def batch_num_valid_reachable_cells(empty: np.ndarray, tokens: list[np.ndarray]) -> list[np.ndarray]:
+        """
+        Return, for each (n, NUM_CELLS) token array, the number of valid empty
+        cells each of the n boards has reachable from those tokens. The empty
+        regions of all boards are labelled together by propagating the
+        smallest cell index through each region.
+        """
+        n = len(empty)
+        no_label = NUM_CELLS
+        grid_empty = _grid(empty)
+        labels = np.where(
+            grid_empty, np.arange(NUM_CELLS).reshape(BOARD_N, BOARD_N), no_label)
+        while True:
+            spread = np.minimum.reduce([
+                labels,
+                np.roll(labels, 1, axis=1), np.roll(labels, -1, axis=1),
+                np.roll(labels, 1, axis=2), np.roll(labels, -1, axis=2),
+            ])
+            spread[~grid_empty] = no_label
+            if np.array_equal(spread, labels):
+                break
+            labels = spread
+
+        # make the labels of different boards distinct, then size the regions
+        regions = labels.reshape(n, NUM_CELLS) \
+            + np.arange(n)[:, None] * (NUM_CELLS + 1)
+        sizes = np.bincount(regions.ravel(), minlength=n * (NUM_CELLS + 1))
+        valid = empty & (sizes[regions] >= 4)
+
+        reachable = []
+        for cells in tokens:
+            touched = np.zeros(len(sizes), dtype=bool)
+            touched[regions[valid & _adjacent_cells(cells)]] = True
+            reachable.append((valid & touched[regions]).sum(axis=1))
+        return reachable
+
+    @staticmethod
+    def heuristic_evaluate_action(move: int, board: Board):
         """
-        Return the heuristic value of a node evaluated from the perspective of 
+        Return the heuristic value of a node evaluated from the perspective of
         the input player.
         """
-        mutation = board.apply_action(action)
+        mutation = board.apply_move(move)
         if board._turn_count < 20:
             heuristic_value = board.diff_cells_occupied() + board.diff_reachable_valid_empty_cell()
         else:
@@ -55,4 +156,4 @@ class OrderActions:
         board.undo_action(mutation)
         return -heuristic_value
 
-        
+
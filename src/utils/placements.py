@@ -0,0 +1,117 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.pieces import PieceType, _TEMPLATES
+from referee.game.coord import Coord
+from referee.game.actions import PlaceAction
+from referee.game.constants import *
+
+from utils.constants import *
+import numpy as np
+
+# ==============================================================================
+# Every tetromino placement on the toroidal board, computed once at import. A
+# placement is identified by its index in these tables; cells are identified by
+# their index r * BOARD_N + c.
+CELL_COORDS = [Coord(i // BOARD_N, i % BOARD_N) for i in range(NUM_CELLS)]
+
+
+def _build_placements():
+    """
+    Return the sorted cell indices of all BOARD_N * BOARD_N * 19 placements.
+    """
+    placements = []
+    for piecetype in PieceType:
+        for origin in CELL_COORDS:
+            cells = sorted(
+                ((origin.r + v.r) % BOARD_N) * BOARD_N + (origin.c + v.c) % BOARD_N
+                for v in _TEMPLATES[piecetype]
+            )
+            placements.append(tuple(cells))
+    return placements
+
+
+# cell indices of each placement, in increasing order
+PLACEMENT_CELLS: list[tuple[int, int, int, int]] = _build_placements()
+NUM_PLACEMENTS = len(PLACEMENT_CELLS)
+
+# bitmask of each placement (bit i set iff the placement covers cell i)
+PLACEMENT_MASKS: list[int] = [
+    sum(1 << i for i in cells) for cells in PLACEMENT_CELLS
+]
+
+# the place action of each placement, with coordinates in sorted order
+PLACEMENT_ACTIONS: list[PlaceAction] = [
+    PlaceAction(*(CELL_COORDS[i] for i in cells)) for cells in PLACEMENT_CELLS
+]
+
+# placement index of each placement bitmask
+PLACEMENT_INDEX: dict[int, int] = {
+    mask: p for p, mask in enumerate(PLACEMENT_MASKS)
+}
+
+# bitmasks of each row and column
+ROW_MASKS: list[int] = [
+    ((1 << BOARD_N) - 1) << (r * BOARD_N) for r in range(BOARD_N)
+]
+COL_MASKS: list[int] = [
+    sum(1 << (r * BOARD_N + c) for r in range(BOARD_N)) for c in range(BOARD_N)
+]
+
+# bitmasks of the distinct rows and columns each placement lies on, i.e. the
+# only lines that placing it can complete
+PLACEMENT_LINE_MASKS: list[tuple[int, ...]] = [
+    tuple(set(ROW_MASKS[i // BOARD_N] for i in cells))
+    + tuple(set(COL_MASKS[i % BOARD_N] for i in cells))
+    for cells in PLACEMENT_CELLS
+]
+
+# NumPy views of the tables above, for evaluating many placements at once:
+# the cells of each line (rows, then columns), the cells of each placement,
+# and the number of cells each placement has on each line
+LINE_CELL_ARRAY = np.array(
+    [[mask >> i & 1 for i in range(NUM_CELLS)] for mask in ROW_MASKS + COL_MASKS],
+    dtype=bool
+)
+PLACEMENT_CELL_ARRAY = np.zeros((NUM_PLACEMENTS, NUM_CELLS), dtype=bool)
+for _p, _cells in enumerate(PLACEMENT_CELLS):
+    PLACEMENT_CELL_ARRAY[_p, list(_cells)] = True
+PLACEMENT_LINE_COUNTS = PLACEMENT_CELL_ARRAY.astype(np.int8) \
+    @ LINE_CELL_ARRAY.T.astype(np.int8)
+
+# indices of the placements covering each cell
+CELL_PLACEMENTS: list[tuple[int, ...]] = [
+    tuple(p for p, cells in enumerate(PLACEMENT_CELLS) if i in cells)
+    for i in range(NUM_CELLS)
+]
+
+# indices of the placements covering each cell or one of its four neighbours,
+# i.e. the placements whose legality can change when that cell changes
+CELL_TOUCHING_PLACEMENTS: list[frozenset[int]] = [
+    frozenset().union(*(
+        CELL_PLACEMENTS[n.r * BOARD_N + n.c]
+        for n in [coord, coord.down(), coord.up(), coord.left(), coord.right()]
+    ))
+    for coord in CELL_COORDS
+]
+
+
+def action_placement(action: PlaceAction) -> int:
+    """
+    Return the placement index of a place action.
+    """
+    mask = 0
+    for coord in action.coords:
+        mask |= 1 << (coord.r * BOARD_N + coord.c)
+    return PLACEMENT_INDEX[mask]
+
+
+# there are only 5 distinct first moves in an empty board due to the toroidal
+# nature of the game board, and accounting for symmetry
+OPENING_MOVES: list[int] = [
+    action_placement(PlaceAction(Coord(4,5), Coord(5,4), Coord(5,5), Coord(5,6))),
+    action_placement(PlaceAction(Coord(4,4), Coord(4,5), Coord(4,6), Coord(5,6))),
+    action_placement(PlaceAction(Coord(4,4), Coord(4,5), Coord(5,5), Coord(5,6))),
+    action_placement(PlaceAction(Coord(5,4), Coord(5,5), Coord(5,6), Coord(5,7))),
+    action_placement(PlaceAction(Coord(4,5), Coord(4,6), Coord(5,5), Coord(5,6))),
+]
@@ -0,0 +1,142 @@
+import json
+import sys
+import time
+
+
+class SearchStats:
+    """
+    Counters of a search, collected over the search of one move and written
+    as a line of JSON at the end of it. The searches only collect them if the
+    agent's `stats` attribute is set (see SEARCH_STATS_FILE), so a disabled
+    collector costs one test per node.
+
+    - nodes: positions searched, including those answered by the
+      transposition table, and leaves: positions evaluated by `eval_fn`
+    - tt_probes, tt_hits, tt_cutoffs: transposition table lookups, those
+      finding an entry, and those ending the search of the position
+    - cutoffs, first_move_cutoffs: beta cutoffs, and those caused by the first
+      move searched (a measure of the move ordering)
+    - ply_nodes, ply_moves: positions expanded, and the moves ordered for
+      search at them, at each ply, giving the branching factor per ply
+    - depths: the time and nodes of each iteration of iterative deepening
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Start collecting the counters of a new move.
+        """
+        self.nodes = 0
+        self.leaves = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.ply_nodes = []
+        self.ply_moves = []
+        self.depths = []
+        self.start_time = time.time()
+        self.depth_start_time = self.start_time
+        self.depth_start_nodes = 0
+
+    def expand(self, ply: int, num_moves: int):
+        """
+        Count the expansion of a position with the given number of moves.
+        """
+        if ply >= len(self.ply_nodes):
+            extra = ply + 1 - len(self.ply_nodes)
+            self.ply_nodes.extend([0] * extra)
+            self.ply_moves.extend([0] * extra)
+        self.ply_nodes[ply] += 1
+        self.ply_moves[ply] += num_moves
+
+    def cutoff(self, index: int):
+        """
+        Count a beta cutoff by the move searched at the given index.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+    def end_depth(self, depth: int):
+        """
+        Record an iteration of iterative deepening to the given depth.
+        """
+        now = time.time()
+        self.depths.append({
+            "depth": depth,
+            "time": now - self.depth_start_time,
+            "nodes": self.nodes - self.depth_start_nodes,
+        })
+        self.depth_start_time = now
+        self.depth_start_nodes = self.nodes
+
+    def merge(self, other: "SearchStats"):
+        """
+        Add the counters of another search of the same move, e.g. by a worker
+        process of a parallel search. Iterations to the same depth are
+        combined, taking the longest time, as the searches ran at once.
+        """
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.tt_probes += other.tt_probes
+        self.tt_hits += other.tt_hits
+        self.tt_cutoffs += other.tt_cutoffs
+        self.cutoffs += other.cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        extra = len(other.ply_nodes) - len(self.ply_nodes)
+        if extra > 0:
+            self.ply_nodes.extend([0] * extra)
+            self.ply_moves.extend([0] * extra)
+        for ply, (nodes, moves) in enumerate(zip(other.ply_nodes, other.ply_moves)):
+            self.ply_nodes[ply] += nodes
+            self.ply_moves[ply] += moves
+        depths = {entry["depth"]: entry for entry in self.depths}
+        for entry in other.depths:
+            if entry["depth"] in depths:
+                merged = depths[entry["depth"]]
+                merged["time"] = max(merged["time"], entry["time"])
+                merged["nodes"] += entry["nodes"]
+            else:
+                depths[entry["depth"]] = dict(entry)
+        self.depths = [depths[depth] for depth in sorted(depths)]
+
+    def summary(self, **extra) -> dict:
+        """
+        Return the counters, and the rates derived from them, as a dictionary
+        that can be serialised to JSON.
+        """
+        elapsed = time.time() - self.start_time
+        return {
+            **extra,
+            "time": elapsed,
+            "nodes": self.nodes,
+            "leaves": self.leaves,
+            "nps": self.nodes / elapsed if elapsed > 0 else 0.0,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "tt_cutoffs": self.tt_cutoffs,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate":
+                self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            "branching": [
+                moves / nodes if nodes else 0.0
+                for nodes, moves in zip(self.ply_nodes, self.ply_moves)
+            ],
+            "depths": self.depths,
+        }
+
+    def dump(self, path: str, **extra):
+        """
+        Append the summary, with any extra fields, as a line of JSON to a file,
+        or to stdout if the path is "-".
+        """
+        line = json.dumps(self.summary(**extra))
+        if path == "-":
+            print(line, file=sys.stdout, flush=True)
+        else:
+            with open(path, "a") as file:
+                file.write(line + "\n")
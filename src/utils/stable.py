@@ -4,29 +4,57 @@ from utils.orderactions import *
 from utils.ttable import *
     
 class StateinfoTable(Table):
-    def __init__(self):
+    """
+    The ordered best moves of both players at each position. If `symmetric`
+    is set, positions are keyed by their canonical key and the moves stored
+    mapped onto the canonical form, as in `TranspositionTable`.
+    """
+    def __init__(self, symmetric: bool = SYMMETRIC_TABLES):
         super().__init__()
+        self.symmetric = symmetric
 
-    def store(self, board: Board, depth, ttable: TranspositionTable, move_values):
-        state_hash = board._state.__hash__()
+    def store(self, board: Board, depth, ttable: TranspositionTable, move_values, noise=0):
         player_color = board._turn_color
-        player_actions = board.get_legal_actions()
+        player_actions = board.get_legal_moves()
         board.modify_turn_color(player_color.opponent)
-        opponent_actions = board.get_legal_actions()
+        opponent_actions = board.get_legal_moves()
         board.modify_turn_color(player_color)
-        ordered_player_actions = OrderActions.order_actions(board, player_actions, ttable, move_values)
-        ordered_opponent_actions = OrderActions.order_actions(board, opponent_actions, ttable, move_values)
+        ordered_player_actions = OrderActions.order_actions(board, player_actions, ttable, move_values, noise)
+        ordered_opponent_actions = OrderActions.order_actions(board, opponent_actions, ttable, move_values, noise)
         state_info = {player_color: ordered_player_actions[:TOPK], player_color.opponent: ordered_opponent_actions[:TOPK], "depth": depth}
-        self.table[state_hash] = state_info
+        if self.symmetric:
+            key, symmetry = board.canonical_key()
+            self.table[key] = self._map_moves(state_info, transform_move, symmetry)
+        else:
+            self.table[board.zobrist_key] = state_info
         return state_info
+
+    @staticmethod
+    def _map_moves(state_info, transform, symmetry):
+        """
+        Return a copy of a state info with the moves mapped by a function of
+        a move and a symmetry.
+        """
+        if symmetry == IDENTITY:
+            return state_info
+        return {
+            k: v if k == "depth" else [transform(move, symmetry) for move in v]
+            for k, v in state_info.items()
+        }
     
-    def retrieve(self, board: Board, depth, ttable: TranspositionTable, move_values):
-        state_info = super().retrieve(board._state)
+    def retrieve(self, board: Board, depth, ttable: TranspositionTable, move_values, noise=0):
+        if self.symmetric:
+            key, symmetry = board.canonical_key()
+            state_info = self.table.get(key)
+            if state_info is not None:
+                state_info = self._map_moves(state_info, inverse_transform_move, symmetry)
+        else:
+            state_info = super().retrieve(board)
         if state_info is None:
-            state_info = self.store(board, depth, ttable, move_values)
+            state_info = self.store(board, depth, ttable, move_values, noise)
         if state_info["depth"] >= depth:
             return state_info
         else:
-            state_info = self.store(board, depth, ttable, move_values)
+            state_info = self.store(board, depth, ttable, move_values, noise)
             return state_info
 
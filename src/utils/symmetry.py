@@ -0,0 +1,235 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+from referee.game.player import PlayerColor
+
+from utils.constants import *
+from utils.placements import *
+from utils.zobrist import *
+
+# ==============================================================================
+# Symmetries of the toroidal board. The board looks the same after any of the
+# BOARD_N * BOARD_N translations (wrapping around the edges) combined with any
+# of the 8 rotations and reflections of the square, and so do the legal moves
+# and line clears. A symmetry (d, dr, dc) applies dihedral transformation d and
+# then moves every cell dr rows and dc columns on.
+#
+# The canonical form of a position is the image with the largest (red, blue)
+# masks over all the symmetries, and its canonical key is the Zobrist key of
+# that image, so that symmetric positions share transposition table entries.
+IDENTITY = (0, 0, 0)
+_LAST = BOARD_N - 1
+_ROW_BITS = (1 << BOARD_N) - 1
+_ALL_CELLS = (1 << NUM_CELLS) - 1
+
+# image (row, column) of a cell (r, c) under each dihedral transformation
+_DIHEDRAL_CELLS = [
+    lambda r, c: (r, c),
+    lambda r, c: (c, _LAST - r),
+    lambda r, c: (_LAST - r, _LAST - c),
+    lambda r, c: (_LAST - c, r),
+    lambda r, c: (r, _LAST - c),
+    lambda r, c: (c, r),
+    lambda r, c: (_LAST - r, c),
+    lambda r, c: (_LAST - c, _LAST - r),
+]
+
+
+def _byte_tables(cell_images: list[int]) -> list[list[int]]:
+    """
+    Return, for each byte of a NUM_CELLS-bit mask, the XOR of the images of
+    the cells set in each of its 256 values, so that a mask can be mapped a
+    byte at a time.
+    """
+    tables = []
+    for k in range(0, NUM_CELLS, 8):
+        table = [0] * 256
+        for byte in range(1, 256):
+            low = (byte & -byte).bit_length() - 1
+            image = cell_images[k + low] if k + low < NUM_CELLS else 0
+            table[byte] = table[byte & (byte - 1)] ^ image
+        tables.append(table)
+    return tables
+
+
+def _lookup(tables: list[list[int]], mask: int) -> int:
+    """
+    Return the combined image of a mask under byte tables: the mask mapped
+    through a dihedral transformation, or the Zobrist key of its tokens.
+    """
+    result = 0
+    k = 0
+    while mask:
+        result ^= tables[k][mask & 0xFF]
+        mask >>= 8
+        k += 1
+    return result
+
+
+# byte tables mapping a mask through each dihedral transformation
+_DIHEDRAL_TABLES = [
+    _byte_tables([
+        1 << (r * BOARD_N + c)
+        for r, c in (transform(i // BOARD_N, i % BOARD_N) for i in range(NUM_CELLS))
+    ])
+    for transform in _DIHEDRAL_CELLS
+]
+# the dihedral transformation undoing each one
+_DIHEDRAL_INVERSES = [
+    next(e for e in range(8) if all(
+        _DIHEDRAL_CELLS[e](*_DIHEDRAL_CELLS[d](r, c)) == (r, c)
+        for r in range(BOARD_N) for c in range(BOARD_N)))
+    for d in range(8)
+]
+# byte tables giving the Zobrist key of the tokens of each colour on a mask
+_ZOBRIST_TABLES = [_byte_tables(cells) for cells in ZOBRIST_CELLS]
+# cells in the columns below each index
+_COLS_BELOW = [sum(COL_MASKS[:k]) for k in range(BOARD_N + 1)]
+
+
+def _rotate_row(row: int, dc: int) -> int:
+    return (row << dc | row >> (BOARD_N - dc)) & _ROW_BITS
+
+
+def _rows(mask: int) -> list[int]:
+    return [mask >> (r * BOARD_N) & _ROW_BITS for r in range(BOARD_N)]
+
+
+# largest rotation of each row of cells, the column shifts giving it, and the
+# row reversed
+_ROW_ROTATION_MAX = [
+    max(_rotate_row(row, dc) for dc in range(BOARD_N)) for row in range(1 << BOARD_N)
+]
+_ROW_ROTATION_SHIFTS = [
+    [dc for dc in range(BOARD_N) if _rotate_row(row, dc) == _ROW_ROTATION_MAX[row]]
+    for row in range(1 << BOARD_N)
+]
+_ROW_REVERSED = [
+    int(format(row, f"0{BOARD_N}b")[::-1], 2) for row in range(1 << BOARD_N)
+]
+_TRANSPOSE = 5
+
+
+def _dihedral_rows(d: int) -> tuple[bool, bool, bool]:
+    """
+    Return how the rows of a mask's image under a dihedral transformation are
+    made from the rows of the mask or of its transpose: (from the transpose,
+    in reverse order, each reversed).
+    """
+    transform = _DIHEDRAL_CELLS[d]
+    transposed = transform(0, 1)[0] != transform(0, 0)[0]
+    source = _DIHEDRAL_CELLS[_TRANSPOSE] if transposed else _DIHEDRAL_CELLS[0]
+    # where the image sends the source's cells (0, 0) and (0, 1)
+    image_origin = transform(*source(0, 0))
+    image_next = transform(*source(0, 1))
+    return transposed, image_origin[0] != 0, image_next[1] < image_origin[1]
+
+
+_DIHEDRAL_ROWS = [_dihedral_rows(d) for d in range(8)]
+
+
+def translate(mask: int, dr: int, dc: int) -> int:
+    """
+    Return the mask with every cell moved dr rows and dc columns on, wrapping
+    around the edges.
+    """
+    if dc:
+        split = _COLS_BELOW[BOARD_N - dc]
+        mask = (mask & split) << dc | (mask & ~split) >> (BOARD_N - dc)
+    if dr:
+        shift = dr * BOARD_N
+        mask = (mask << shift | mask >> (NUM_CELLS - shift)) & _ALL_CELLS
+    return mask
+
+
+def transform(mask: int, symmetry: tuple[int, int, int]) -> int:
+    """
+    Return the image of a mask under a symmetry.
+    """
+    d, dr, dc = symmetry
+    return translate(_lookup(_DIHEDRAL_TABLES[d], mask), dr, dc)
+
+
+def inverse_transform(mask: int, symmetry: tuple[int, int, int]) -> int:
+    """
+    Return the mask whose image under a symmetry is the given mask.
+    """
+    d, dr, dc = symmetry
+    mask = translate(mask, -dr % BOARD_N, -dc % BOARD_N)
+    return _lookup(_DIHEDRAL_TABLES[_DIHEDRAL_INVERSES[d]], mask)
+
+
+def transform_move(move: int, symmetry: tuple[int, int, int]) -> int:
+    """
+    Return the image of a move (placement index) under a symmetry.
+    """
+    if symmetry == IDENTITY:
+        return move
+    return PLACEMENT_INDEX[transform(PLACEMENT_MASKS[move], symmetry)]
+
+
+def inverse_transform_move(move: int, symmetry: tuple[int, int, int]) -> int:
+    """
+    Return the move whose image under a symmetry is the given move.
+    """
+    if symmetry == IDENTITY:
+        return move
+    return PLACEMENT_INDEX[inverse_transform(PLACEMENT_MASKS[move], symmetry)]
+
+
+def canonical_form(red: int, blue: int) -> tuple[int, int, tuple[int, int, int]]:
+    """
+    Return the red and blue masks of the canonical form of a position, and a
+    symmetry mapping the position onto it.
+
+    Rather than trying all BOARD_N * BOARD_N * 8 symmetries, only those moving
+    a row to the top (most significant) row in the largest rotation of any
+    row are tried, as the largest masks must have the largest possible top
+    row.
+    """
+    if not red | blue:
+        return red, blue, IDENTITY
+    # red decides the order, unless there are no red tokens at all. The rows
+    # of every image of it are rows or columns of the original, so the best
+    # top row is found without mapping the masks
+    primary = red or blue
+    sources = (_rows(primary), _rows(_lookup(_DIHEDRAL_TABLES[_TRANSPOSE], primary)))
+    top = -1
+    tops = []
+    for d, (transposed, flip_rows, flip_bits) in enumerate(_DIHEDRAL_ROWS):
+        for r, row in enumerate(sources[transposed]):
+            if flip_bits:
+                row = _ROW_REVERSED[row]
+            value = _ROW_ROTATION_MAX[row]
+            if value < top:
+                continue
+            if value > top:
+                top = value
+                tops = []
+            tops.append((d, _LAST - r if flip_rows else r, row))
+
+    best = None
+    images = {}
+    for d, r, row in tops:
+        if d not in images:
+            images[d] = (_lookup(_DIHEDRAL_TABLES[d], red), _lookup(_DIHEDRAL_TABLES[d], blue))
+        d_red, d_blue = images[d]
+        dr = _LAST - r
+        for dc in _ROW_ROTATION_SHIFTS[row]:
+            candidate = (translate(d_red, dr, dc), translate(d_blue, dr, dc))
+            if best is None or candidate > best:
+                best = candidate
+                symmetry = (d, dr, dc)
+    return *best, symmetry
+
+
+def canonical_key(red: int, blue: int, turn_color: PlayerColor) -> tuple[int, tuple[int, int, int]]:
+    """
+    Return the canonical key of a position, and a symmetry mapping the
+    position onto its canonical form.
+    """
+    red, blue, symmetry = canonical_form(red, blue)
+    key = _lookup(_ZOBRIST_TABLES[PlayerColor.RED], red) \
+        ^ _lookup(_ZOBRIST_TABLES[PlayerColor.BLUE], blue) \
+        ^ zobrist_turn(turn_color)
+    return key, symmetry
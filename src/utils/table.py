@@ -5,7 +5,6 @@ class Table:
     def __init__(self):
         self.table = dict()
 
-    def retrieve(self, boardstate: BoardState):
-        state_hash = boardstate.__hash__()
-        return self.table.get(state_hash)
+    def retrieve(self, board: Board):
+        return self.table.get(board.zobrist_key)
 
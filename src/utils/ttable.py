@@ -1,24 +1,202 @@
 from utils.board import *
 from utils.constants import *
-from utils.table import *
-
-class TranspositionTable(Table):
-    def __init__(self):
-        super().__init__()
-        
-    def store(self, board: Board, node_type, depth, best_action, best_value):
-        state_hash = board._state.__hash__()
-        entry = TTEntry(node_type, depth, best_action, best_value)
-        self.table[state_hash] = entry
-        return entry
-    
-    def remove_least_valuable_entry(self):
-        least_valuable_key = min(self.table, key=lambda x: self.table[x].depth)
-        del self.table[least_valuable_key]
-    
+from utils.symmetry import *
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+
+# node types are stored as small integer codes
+_NODE_TYPE_CODES = {EXACT: 0, LOWER_BOUND: 1, UPPER_BOUND: 2}
+_NODE_TYPES = [EXACT, LOWER_BOUND, UPPER_BOUND]
+_EMPTY_DEPTH = -1
+_NO_MOVE = -1
+# arrays of the table, in the order they are laid out in memory (largest item
+# size first, so that every array is aligned)
+_LAYOUT = [
+    ("keys", np.uint64), ("values", np.float64), ("moves", np.int32),
+    ("depths", np.int16), ("node_types", np.int8), ("generations", np.uint8),
+]
+
+class TranspositionTable:
+    """
+    A fixed-capacity transposition table stored in preallocated numpy arrays.
+    The table has 2**size_log2 buckets of two entries each, indexed by the low
+    bits of the Zobrist key. The first entry of a bucket is depth-preferred:
+    it is only replaced by a search at least as deep, or once it is left over
+    from the search of a previous move. The second entry is always replaced.
+
+    If `shared` is set, the arrays live in a `multiprocessing.shared_memory`
+    block, so that processes forked afterwards read and write the same table.
+    No locks are taken: the key of an entry is stored XORed with a checksum of
+    its other fields, so an entry torn by concurrent writes no longer matches
+    its key and reads as a miss.
+
+    If `symmetric` is set, positions are keyed by their canonical key (see
+    `utils.symmetry`), so that positions equal up to a symmetry of the board
+    share an entry, and best moves are stored mapped onto the canonical form.
+    `retrieve_values` still takes plain Zobrist keys, which only find the
+    entries of positions that are their own canonical form.
+    """
+    def __init__(self, size_log2: int = TT_SIZE_LOG2, shared: bool = False, symmetric: bool = SYMMETRIC_TABLES):
+        self.symmetric = symmetric
+        self.num_buckets = 1 << size_log2
+        num_entries = self.num_buckets * 2
+        self.shared_memory = None
+        if shared:
+            nbytes = sum(np.dtype(dtype).itemsize for _, dtype in _LAYOUT)
+            self.shared_memory = SharedMemory(create=True, size=num_entries * nbytes)
+            offset = 0
+            for name, dtype in _LAYOUT:
+                array = np.ndarray(
+                    num_entries, dtype=dtype, buffer=self.shared_memory.buf, offset=offset)
+                setattr(self, name, array)
+                offset += array.nbytes
+            # the mapping outlives the name, and children inherit it on fork
+            self.shared_memory.unlink()
+        else:
+            for name, dtype in _LAYOUT:
+                setattr(self, name, np.zeros(num_entries, dtype=dtype))
+        self.depths.fill(_EMPTY_DEPTH)
+        self.moves.fill(_NO_MOVE)
+        self.value_bits = self.values.view(np.uint64)
+        self.generation = 0
+
+    def close(self):
+        """
+        Release the shared memory block of a shared table, whose name is
+        already unlinked. The table cannot be used afterwards.
+        """
+        if self.shared_memory is None:
+            return
+        # the block cannot be closed while arrays still refer to it
+        for name, _ in _LAYOUT:
+            delattr(self, name)
+        del self.value_bits
+        self.shared_memory.close()
+        self.shared_memory = None
+
+    def new_search(self):
+        """
+        Start the search of a new move. Entries stored by earlier searches are
+        kept, but may be overwritten by shallower ones.
+        """
+        self.generation = (self.generation + 1) % 256
+
+    @staticmethod
+    def _checksum(depth: int, node_type: int, value_bits: int, move: int, generation: int) -> int:
+        """
+        Return the checksum of the fields of an entry other than its key.
+        """
+        return value_bits ^ (
+            (depth & 0xFFFF) << 48 | node_type << 40 | generation << 32
+            | move & 0xFFFFFFFF
+        )
+
+    @staticmethod
+    def _checksums(depths, node_types, value_bits, moves, generations) -> np.ndarray:
+        """
+        Return the checksums of arrays of entry fields.
+        """
+        u64 = np.uint64
+        return value_bits ^ (
+            (depths.astype(u64) & u64(0xFFFF)) << u64(48)
+            | node_types.astype(u64) << u64(40)
+            | generations.astype(u64) << u64(32)
+            | moves.astype(u64) & u64(0xFFFFFFFF)
+        )
+
+    def _read(self, j: int):
+        """
+        Return the key, depth, node type code, value bits, move and generation
+        of an entry, or None if it is empty. Each field is read exactly once,
+        so that the key check covers the returned fields even while other
+        processes write to the entry.
+        """
+        depth = int(self.depths[j])
+        if depth == _EMPTY_DEPTH:
+            return None
+        fields = (depth, int(self.node_types[j]), int(self.value_bits[j]),
+                  int(self.moves[j]), int(self.generations[j]))
+        return int(self.keys[j]) ^ self._checksum(*fields), *fields
+
+    def _find(self, key: int):
+        """
+        Return the fields of the entry holding the key, or None if there is
+        none.
+        """
+        i = (key & (self.num_buckets - 1)) * 2
+        for j in (i, i + 1):
+            entry = self._read(j)
+            if entry is not None and entry[0] == key:
+                return entry
+        return None
+
+    def _key(self, board: Board) -> tuple[int, tuple[int, int, int]]:
+        """
+        Return the key of a board in the table, and the symmetry mapping its
+        moves onto the stored ones.
+        """
+        if self.symmetric:
+            return board.canonical_key()
+        return board.zobrist_key, IDENTITY
+
+    def retrieve(self, board: Board):
+        key, symmetry = self._key(board)
+        entry = self._find(key)
+        if entry is None:
+            return None
+        _, depth, node_type, value_bits, move, _ = entry
+        return TTEntry(
+            _NODE_TYPES[node_type],
+            depth,
+            inverse_transform_move(move, symmetry) if move != _NO_MOVE else None,
+            float(np.uint64(value_bits).view(np.float64))
+        )
+
+    def retrieve_values(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Return the best value stored for each of an array of keys, or NaN for
+        keys that are not in the table.
+        """
+        i = (keys & np.uint64(self.num_buckets - 1)).astype(np.int64) * 2
+        values = np.full(len(keys), np.nan)
+        # the first entry of a bucket takes precedence, so it is written last
+        for j in (i + 1, i):
+            depths = self.depths[j]
+            value_bits = self.value_bits[j]
+            checksums = self._checksums(
+                depths, self.node_types[j], value_bits, self.moves[j],
+                self.generations[j])
+            hit = (depths != _EMPTY_DEPTH) & (self.keys[j] ^ checksums == keys)
+            values[hit] = value_bits[hit].view(np.float64)
+        return values
+
+    def store(self, board: Board, node_type, depth, best_move, best_value):
+        key, symmetry = self._key(board)
+        i = (key & (self.num_buckets - 1)) * 2
+        entry = self._read(i)
+        if entry is None \
+                or entry[0] == key \
+                or entry[5] != self.generation \
+                or depth >= entry[1]:
+            j = i
+        else:
+            j = i + 1
+        node_type_code = _NODE_TYPE_CODES[node_type]
+        value_bits = int(np.float64(best_value).view(np.uint64))
+        move = transform_move(best_move, symmetry) if best_move is not None else _NO_MOVE
+        # the key is written last, and the entry fails its key check until then
+        self.depths[j] = depth
+        self.node_types[j] = node_type_code
+        self.value_bits[j] = value_bits
+        self.moves[j] = move
+        self.generations[j] = self.generation
+        self.keys[j] = key ^ self._checksum(
+            depth, node_type_code, value_bits, move, self.generation)
+        return TTEntry(node_type, depth, best_move, best_value)
+
 class TTEntry:
-    def __init__(self, node_type, depth, best_action, best_value):
+    def __init__(self, node_type, depth, best_move, best_value):
         self.node_type = node_type
         self.depth = depth
-        self.best_action = best_action
+        self.best_move = best_move
         self.best_value = best_value
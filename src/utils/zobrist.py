@@ -0,0 +1,55 @@
+# COMP30024 Artificial Intelligence, Semester 1 2024
+# Project Part B: Game Playing Agent
+
+import random
+import numpy as np
+
+from referee.game.player import PlayerColor
+
+from utils.constants import *
+from utils.placements import *
+
+# ==============================================================================
+# Zobrist keys. A position's key is the XOR of the key of every token on the
+# board (per cell and colour), and of ZOBRIST_BLUE_TO_MOVE if it is blue's
+# turn. The generator is seeded so that keys are identical across processes
+# and runs.
+ZOBRIST_SEED = 30024
+_rng = random.Random(ZOBRIST_SEED)
+
+# key of a token of each colour (indexed by PlayerColor) on each cell
+ZOBRIST_CELLS: list[list[int]] = [
+    [_rng.getrandbits(64) for _ in range(NUM_CELLS)] for _ in PlayerColor
+]
+ZOBRIST_BLUE_TO_MOVE: int = _rng.getrandbits(64)
+
+# combined key of the four tokens of each placement, for each colour
+ZOBRIST_PLACEMENTS: list[list[int]] = [
+    [cells[a] ^ cells[b] ^ cells[c] ^ cells[d]
+     for a, b, c, d in PLACEMENT_CELLS]
+    for cells in ZOBRIST_CELLS
+]
+
+# the tables above as NumPy arrays, indexed by [PlayerColor, cell/placement]
+ZOBRIST_CELL_ARRAY = np.array(ZOBRIST_CELLS, dtype=np.uint64)
+ZOBRIST_PLACEMENT_ARRAY = np.array(ZOBRIST_PLACEMENTS, dtype=np.uint64)
+
+
+def zobrist_mask(mask: int, color: PlayerColor) -> int:
+    """
+    Return the combined key of tokens of a colour on the cells of a mask.
+    """
+    cells = ZOBRIST_CELLS[color]
+    key = 0
+    while mask:
+        low = mask & -mask
+        key ^= cells[low.bit_length() - 1]
+        mask ^= low
+    return key
+
+
+def zobrist_turn(color: PlayerColor) -> int:
+    """
+    Return the side-to-move component of the key.
+    """
+    return ZOBRIST_BLUE_TO_MOVE if color == PlayerColor.BLUE else 0